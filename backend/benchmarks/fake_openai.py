@@ -0,0 +1,159 @@
+# ==============================================================================
+# Local OpenAI-compatible stand-in for benchmarks (no API key, no cost, no variance).
+#
+# Serves POST /v1/chat/completions (plain and stream=true) with canned answers
+# chosen from the prompt: a number for ATS scores, bullet points for
+# suggestions, resume JSON for extraction/rewriting, {"value": ...} echoes for
+# section rewrites. Latency is configurable per request and per output token.
+#
+#     python benchmarks/fake_openai.py --port 8089 --latency 0.8 --token-latency 0.002
+#     OPENAI_BASE_URL=http://127.0.0.1:8089/v1 OPENAI_API_KEY=bench python run.py
+# ==============================================================================
+
+import argparse
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+CANNED_RESUME = {
+    "name": "Alex Morgan",
+    "contact": {"Location": "Austin, TX", "Email": "alex@example.com", "Phone": "+1 555 0100", "LinkedIn": "linkedin.com/in/alexmorgan"},
+    "summary": "Backend engineer with six years of experience building Python web services and data pipelines.",
+    "experience": [
+        {"role": "Senior Backend Engineer", "company": "Northwind | 2021 - Present | Austin", "duties": [
+            "Designed Flask microservices serving 2M requests per day.",
+            "Cut PostgreSQL query latency by 40% through indexing and caching.",
+            "Led migration of batch jobs to Airflow on AWS.",
+        ]},
+        {"role": "Software Engineer", "company": "Contoso | 2018 - 2021 | Dallas", "duties": [
+            "Built REST APIs in Django for internal tooling.",
+            "Introduced CI/CD with GitHub Actions and Docker.",
+        ]},
+    ],
+    "projects": [{"role": "Resume Optimizer", "company": "Python, Flask, React", "duties": ["Built an ATS scoring service."]}],
+    "education": [{"degree": "BS Computer Science", "university": "UT Austin | 2018"}],
+    "skills": {"Technical Skills": ["Python", "Flask", "Django", "PostgreSQL", "AWS", "Docker"], "Soft Skills": ["Mentoring", "Communication"]},
+}
+CANNED_SUGGESTIONS = (
+    "- Quantify the impact of your Flask services with latency or cost numbers.\n"
+    "- Mention Kubernetes and Terraform if you have used them.\n"
+    "- Move the most relevant AWS experience to the top of the summary.\n"
+    "- Add a short projects section highlighting data pipeline work."
+)
+
+
+class Config:
+    latency = 0.5         # seconds before the first byte of every response
+    token_latency = 0.0   # extra seconds per output "token" (whitespace-separated word)
+    jitter = 0.0          # +/- fraction applied to latency
+    requests = 0
+    lock = threading.Lock()
+
+
+def canned_answer(body):
+    messages = body.get('messages') or []
+    system = messages[0].get('content', '') if messages else ''
+    user = messages[-1].get('content', '') if messages else ''
+    if 'ATS' in system:
+        return str(random.Random(user).randint(55, 90))
+    if body.get('response_format', {}).get('type') == 'json_object':
+        section = re.search(r"```json\s*(\{.*\})\s*```", user, re.S)
+        if section and '{"value": ...}' in system:
+            try:
+                return json.dumps(json.loads(section.group(1)))
+            except ValueError:
+                pass
+        return json.dumps(CANNED_RESUME)
+    return CANNED_SUGGESTIONS
+
+
+def usage_for(body, text):
+    prompt_tokens = sum(len(str(m.get('content', '')).split()) for m in body.get('messages') or [])
+    completion_tokens = len(text.split())
+    return {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens, "total_tokens": prompt_tokens + completion_tokens}
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        if not self.path.rstrip('/').endswith('/chat/completions'):
+            self.send_error(404)
+            return
+        body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+        with Config.lock:
+            Config.requests += 1
+        text = canned_answer(body)
+        delay = Config.latency * (1 + random.uniform(-Config.jitter, Config.jitter))
+        time.sleep(max(delay, 0))
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:24]}"
+        model = body.get('model', 'gpt-4o')
+        if body.get('stream'):
+            usage = usage_for(body, text) if (body.get('stream_options') or {}).get('include_usage') else None
+            self._stream(completion_id, model, text, usage)
+            return
+        time.sleep(Config.token_latency * len(text.split()))
+        payload = json.dumps({
+            "id": completion_id, "object": "chat.completion", "created": int(time.time()), "model": model,
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+            "usage": usage_for(body, text),
+        }).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _stream(self, completion_id, model, text, usage=None):
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Connection', 'close')
+        self.end_headers()
+        for word in re.findall(r"\S+\s*", text):
+            chunk = {"id": completion_id, "object": "chat.completion.chunk", "created": int(time.time()), "model": model,
+                     "choices": [{"index": 0, "delta": {"content": word}, "finish_reason": None}]}
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode('utf-8'))
+            self.wfile.flush()
+            time.sleep(Config.token_latency)
+        if usage:
+            chunk = {"id": completion_id, "object": "chat.completion.chunk", "created": int(time.time()), "model": model,
+                     "choices": [], "usage": usage}
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode('utf-8'))
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+        self.close_connection = True
+
+
+def start(port=0, latency=0.5, token_latency=0.0, jitter=0.0):
+    """Start the server on a daemon thread; returns (server, base_url)."""
+    Config.latency, Config.token_latency, Config.jitter = latency, token_latency, jitter
+    server = ThreadingHTTPServer(('127.0.0.1', port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/v1"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake OpenAI chat completions server")
+    parser.add_argument('--port', type=int, default=8089)
+    parser.add_argument('--latency', type=float, default=0.5, help='seconds per response before the first byte')
+    parser.add_argument('--token-latency', type=float, default=0.0, help='extra seconds per output token')
+    parser.add_argument('--jitter', type=float, default=0.0, help='random +/- fraction applied to --latency')
+    args = parser.parse_args()
+    server, base_url = start(args.port, args.latency, args.token_latency, args.jitter)
+    print(f"Fake OpenAI listening at {base_url} (latency {args.latency}s, per-token {args.token_latency}s)")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,275 @@
+# ==============================================================================
+# Load test: concurrent users against /api/optimize and /api/generate-pdf.
+#
+# By default everything runs offline in this process: a fake OpenAI server
+# (benchmarks/fake_openai.py) with fixed latency, and the Flask app served on a
+# threaded local server pointed at it. Each phase (optimize, then generate-pdf
+# for every template) runs --users concurrent logged-in sessions doing
+# --requests calls each, and reports p50/p95/p99 latency, throughput, errors
+# and process memory. Run from backend/:
+#     python benchmarks/load_test.py --users 8 --requests 5 --llm-latency 0.5
+#     python benchmarks/load_test.py --unique-resumes          # defeat the caches
+#     python benchmarks/load_test.py --upload-once             # send resumeId, not the file
+#     python benchmarks/load_test.py --json before.json        # save for comparison
+#
+# To measure a real deployment (e.g. gunicorn), start fake_openai.py, launch the
+# app with OPENAI_BASE_URL pointing at it and SESSION_COOKIE_SECURE off or TLS
+# in front, then pass --base-url (and --server-pid for its memory).
+# ==============================================================================
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import requests
+from docx import Document
+
+import fake_openai
+
+JOB_DESCRIPTION = (
+    "We are hiring a Senior Python Backend Engineer to build Flask and Django microservices on AWS. "
+    "You will design REST APIs, tune PostgreSQL and Redis, run Docker and Kubernetes workloads, "
+    "and own CI/CD pipelines. Experience with Airflow, Kafka and Terraform is a plus."
+)
+
+
+def sample_resume(variant=None):
+    """A .docx resume as bytes; a variant string makes its content (and every cache key) unique."""
+    resume = fake_openai.CANNED_RESUME
+    doc = Document()
+    doc.add_heading(resume['name'] + (f" {variant}" if variant else ''), 0)
+    doc.add_paragraph(' | '.join(resume['contact'].values()))
+    doc.add_paragraph(resume['summary'])
+    for job in resume['experience']:
+        doc.add_heading(f"{job['role']} - {job['company']}", 2)
+        for duty in job['duties']:
+            doc.add_paragraph(duty, style='List Bullet')
+    doc.add_paragraph('Skills: ' + ', '.join(resume['skills']['Technical Skills']))
+    buffer = BytesIO()
+    doc.save(buffer)
+    return buffer.getvalue()
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, round(pct / 100 * len(sorted_values) + 0.5) - 1))
+    return sorted_values[index]
+
+
+def rss_bytes(pid='self'):
+    """Resident set size of a process plus all its descendants (gunicorn workers, forkserver render
+    workers), from /proc; None elsewhere."""
+    def read(p):
+        try:
+            with open(f'/proc/{p}/status') as f:
+                for line in f:
+                    if line.startswith('VmRSS:'):
+                        return int(line.split()[1]) * 1024
+        except OSError:
+            return 0
+        return 0
+
+    def children(p):
+        try:
+            tasks = os.listdir(f'/proc/{p}/task')
+        except OSError:
+            return []
+        found = []
+        for task in tasks:
+            try:
+                with open(f'/proc/{p}/task/{task}/children') as f:
+                    found += f.read().split()
+            except OSError:
+                pass
+        return found
+
+    if not os.path.exists(f'/proc/{pid}'):
+        return None
+    total, seen, pending = 0, set(), [str(pid)]
+    while pending:
+        p = pending.pop()
+        if p in seen:
+            continue
+        seen.add(p)
+        total += read(p)
+        pending += children(p)
+    return total
+
+
+def start_local_app(llm_latency, token_latency, jitter):
+    """Fake OpenAI + the Flask app on local threaded servers; returns (app base URL, template ids)."""
+    _, openai_url = fake_openai.start(0, llm_latency, token_latency, jitter)
+    workdir = tempfile.mkdtemp(prefix='resume_bench_')
+    os.environ['OPENAI_BASE_URL'] = openai_url
+    os.environ['OPENAI_API_KEY'] = 'bench'
+    os.environ.setdefault('DATABASE_URL', 'sqlite:///' + os.path.join(workdir, 'bench.db'))
+    os.environ.setdefault('SHARED_CACHE_PATH', os.path.join(workdir, 'cache.db'))
+    os.environ.setdefault('OPENAI_CACHE_PATH', os.path.join(workdir, 'openai_cache.db'))
+
+    from werkzeug.serving import make_server
+    import run
+    run.app.config['SESSION_COOKIE_SECURE'] = False  # plain http on localhost
+    with run.app.app_context():
+        run.db.create_all()
+    server = make_server('127.0.0.1', 0, run.app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    print(f"Fake OpenAI at {openai_url}; app at http://127.0.0.1:{server.server_port} (data in {workdir})")
+    return f"http://127.0.0.1:{server.server_port}", sorted(run.TEMPLATES)
+
+
+def login_session(base_url, index):
+    session = requests.Session()
+    credentials = {'username': f"bench_{uuid.uuid4().hex[:8]}_{index}", 'password': 'bench-password'}
+    session.post(f"{base_url}/api/register", json=credentials, timeout=30).raise_for_status()
+    session.post(f"{base_url}/api/login", json=credentials, timeout=30).raise_for_status()
+    return session
+
+
+def upload_resume(session, base_url, resume):
+    response = session.post(f"{base_url}/api/resumes", files={'resumeFile': ('resume.docx', resume)}, timeout=60)
+    response.raise_for_status()
+    return response.json()['resumeId']
+
+
+def resume_fields(resume):
+    """(files, form) for a resume given as .docx bytes or as an uploaded resumeId."""
+    if isinstance(resume, str):
+        return None, {'resumeId': resume}
+    return {'resumeFile': ('resume.docx', resume)}, {}
+
+
+def call_optimize(session, base_url, resume, template_id):
+    files, form = resume_fields(resume)
+    return session.post(f"{base_url}/api/optimize", files=files, data={**form, 'jobDescription': JOB_DESCRIPTION}, timeout=300)
+
+
+def call_generate_pdf(session, base_url, resume, template_id):
+    files, form = resume_fields(resume)
+    form.update({'jobDescription': JOB_DESCRIPTION, 'aiSuggestions': fake_openai.CANNED_SUGGESTIONS, 'templateId': template_id})
+    return session.post(f"{base_url}/api/generate-pdf", files=files, data=form, timeout=300)
+
+
+def run_phase(label, call, sessions, resumes, base_url, template_id, requests_per_user, server_pid, trace):
+    latencies, errors = [], []
+    lock = threading.Lock()
+
+    def user_loop(index):
+        for _ in range(requests_per_user):
+            start = time.perf_counter()
+            try:
+                response = call(sessions[index], base_url, resumes[index], template_id)
+                ok = response.status_code == 200
+                detail = f"HTTP {response.status_code}: {response.text[:120]}"
+            except requests.RequestException as e:
+                ok, detail = False, str(e)
+            elapsed = time.perf_counter() - start
+            with lock:
+                (latencies if ok else errors).append(elapsed if ok else detail)
+
+    rss_before = rss_bytes(server_pid)
+    if trace:
+        tracemalloc.reset_peak()
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=len(sessions)) as pool:
+        list(pool.map(user_loop, range(len(sessions))))
+    wall = time.perf_counter() - started
+    rss_after = rss_bytes(server_pid)
+
+    latencies.sort()
+    result = {
+        'phase': label,
+        'requests': len(latencies) + len(errors),
+        'errors': len(errors),
+        'wall_s': round(wall, 3),
+        'throughput_rps': round((len(latencies) + len(errors)) / wall, 2) if wall else None,
+        'p50_s': percentile(latencies, 50),
+        'p95_s': percentile(latencies, 95),
+        'p99_s': percentile(latencies, 99),
+        'max_s': latencies[-1] if latencies else None,
+        'rss_mb': round(rss_after / 2**20, 1) if rss_after else None,
+        'rss_growth_mb': round((rss_after - rss_before) / 2**20, 1) if rss_after and rss_before else None,
+        'py_peak_mb': round(tracemalloc.get_traced_memory()[1] / 2**20, 1) if trace else None,
+    }
+    if errors:
+        result['first_error'] = errors[0]
+    return result
+
+
+def print_report(results):
+    def fmt(value, unit=''):
+        return '-' if value is None else f"{value:.3f}{unit}" if isinstance(value, float) and unit == 's' else f"{value}{unit}"
+    header = f"{'phase':<26}{'reqs':>6}{'err':>5}{'rps':>8}{'p50':>9}{'p95':>9}{'p99':>9}{'rss MB':>9}{'+MB':>7}{'py peak':>9}"
+    print('\n' + header)
+    print('-' * len(header))
+    for r in results:
+        print(f"{r['phase']:<26}{r['requests']:>6}{r['errors']:>5}{fmt(r['throughput_rps']):>8}"
+              f"{fmt(r['p50_s'], 's'):>9}{fmt(r['p95_s'], 's'):>9}{fmt(r['p99_s'], 's'):>9}"
+              f"{fmt(r['rss_mb']):>9}{fmt(r['rss_growth_mb']):>7}{fmt(r['py_peak_mb']):>9}")
+    for r in results:
+        if r.get('first_error'):
+            print(f"⚠️ {r['phase']}: {r['errors']} errors, first: {r['first_error']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline load test for the resume builder API")
+    parser.add_argument('--users', type=int, default=4, help='concurrent logged-in users per phase')
+    parser.add_argument('--requests', type=int, default=3, help='requests per user per phase')
+    parser.add_argument('--templates', default='all', help="comma-separated template ids for generate-pdf, or 'all'")
+    parser.add_argument('--skip-optimize', action='store_true')
+    parser.add_argument('--unique-resumes', action='store_true', help='give every user a different resume so caches miss')
+    parser.add_argument('--upload-once', action='store_true', help='upload each resume via /api/resumes and send its resumeId')
+    parser.add_argument('--llm-latency', type=float, default=0.5, help='fake OpenAI seconds per completion')
+    parser.add_argument('--token-latency', type=float, default=0.0, help='fake OpenAI extra seconds per output token')
+    parser.add_argument('--jitter', type=float, default=0.0, help='fake OpenAI +/- latency fraction')
+    parser.add_argument('--base-url', help='test an already-running app instead of starting one in-process')
+    parser.add_argument('--server-pid', help='pid of the --base-url server, to report its (and its workers\') RSS')
+    parser.add_argument('--tracemalloc', action='store_true', help='report peak Python allocations per phase (in-process only; slows the app)')
+    parser.add_argument('--json', help='also write the results to this file')
+    args = parser.parse_args()
+
+    if args.base_url:
+        base_url, server_pid, trace = args.base_url.rstrip('/'), args.server_pid, False
+        templates = args.templates.split(',') if args.templates != 'all' else ['template1', 'template3', 'template4']
+    else:
+        trace = args.tracemalloc
+        if trace:
+            tracemalloc.start()
+        base_url, templates = start_local_app(args.llm_latency, args.token_latency, args.jitter)
+        server_pid = 'self'
+        if args.templates != 'all':
+            templates = args.templates.split(',')
+
+    sessions = [login_session(base_url, i) for i in range(args.users)]
+    shared = sample_resume()
+    resumes = [sample_resume(f"#{i}") if args.unique_resumes else shared for i in range(args.users)]
+    if args.upload_once:
+        resumes = [upload_resume(session, base_url, resume) for session, resume in zip(sessions, resumes)]
+    print(f"{args.users} users x {args.requests} requests per phase; unique resumes: {args.unique_resumes}; upload once: {args.upload_once}")
+
+    phases = [] if args.skip_optimize else [('optimize', call_optimize, None)]
+    phases += [(f"generate-pdf {t}", call_generate_pdf, t) for t in templates]
+    results = []
+    for label, call, template_id in phases:
+        print(f"▶ {label} ...")
+        results.append(run_phase(label, call, sessions, resumes, base_url, template_id, args.requests, server_pid, trace))
+
+    print_report(results)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'args': vars(args), 'results': results}, f, indent=2)
+        print(f"Results written to {args.json}")
+
+
+if __name__ == '__main__':
+    main()
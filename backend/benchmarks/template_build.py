@@ -0,0 +1,90 @@
+# ==============================================================================
+# Benchmark: per-build cost of template stylesheets and image assets.
+#
+# Compares a build() that reuses the module-level STYLES / decoded images with
+# the old behaviour of rebuilding the stylesheet and re-reading the images on
+# every call. Run from backend/:
+#     python benchmarks/template_build.py --iterations 200
+# ==============================================================================
+
+import argparse
+import os
+import sys
+import time
+from io import BytesIO
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from reportlab.lib.pagesizes import letter
+from reportlab.lib.utils import ImageReader
+from reportlab.platypus import SimpleDocTemplate
+from templates import template1, template3, template4
+
+SAMPLES = {
+    'template1': (template1, {
+        "name": "Farhan Ahmad",
+        "contact": {"Location": "Islamabad", "Email": "a@b.com", "Phone": "123", "LinkedIn": "in/x"},
+        "summary": "Machine Learning Engineer with production experience.",
+        "experience": [{"role": "ML Engineer", "company": "TechLogix | 2022 - Present | Islamabad", "duties": ["Built models", "Shipped APIs"]}],
+        "projects": [{"role": "Resume Optimizer", "company": "Python, Flask", "duties": ["Designed the backend"]}],
+        "education": [{"degree": "BS AI", "university": "Bahria University | 2022"}],
+        "skills": {"Technical Skills": ["Python", "TensorFlow"], "Soft Skills": ["Leadership"]},
+    }),
+    'template3': (template3, {
+        "name": "Farhan Ahmad", "title": "ML Engineer",
+        "contact": {"Phone": "123", "Website": "in/x", "Email": "a@b.com"},
+        "profile": "Machine Learning Engineer with production experience.",
+        "work_experience": [{"company": "Systems Limited", "role": "Cloud Intern", "dates": "2025", "duties": "Built pipelines"}],
+        "education": [{"university": "Bahria University", "dates": "2020-2024", "details": "CGPA: 3.8"}],
+        "skills": ["Python", "TensorFlow", "Leadership"], "hobbies": ["Chess"],
+    }),
+    'template4': (template4, {
+        "name": "Farhan Ahmad", "title": "ML Engineer",
+        "contact": {"phone": "123", "email": "a@b.com", "address": "Islamabad", "website": "in/x"},
+        "profile_summary": "Machine Learning Engineer with production experience.",
+        "work_experience": [{"company": "Systems Limited", "role": "Cloud Intern", "dates": "2025", "duties": ["Built pipelines"]}],
+        "education": [{"university": "Bahria University", "degree": "BS AI", "dates": "2020-2024", "details": ["CGPA: 3.8"]}],
+        "skills": ["Python", "TensorFlow"], "languages": [{"language": "English", "level": "Fluent"}],
+    }),
+}
+
+
+def legacy_setup(module):
+    """What every build() used to pay before the styles and images were cached."""
+    module.build_styles()
+    for path in (getattr(module, 'GRAPHIC_PATH', None), getattr(module, 'WATERMARK_PATH', None)):
+        if path and os.path.exists(path):
+            ImageReader(path).getRGBData()
+
+
+def time_per_call(fn, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - start) / iterations * 1000
+
+
+def render(module, data):
+    doc = SimpleDocTemplate(BytesIO(), pagesize=letter)
+    doc.build(module.build(data))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--iterations', type=int, default=100)
+    parser.add_argument('--render', action='store_true', help='also time SimpleDocTemplate.build for context')
+    args = parser.parse_args()
+
+    print(f"{'template':<10} {'cached build':>14} {'legacy build':>14} {'saved/build':>13}" + (f" {'full render':>13}" if args.render else ''))
+    for template_id, (module, data) in SAMPLES.items():
+        module.build(data)  # warm-up
+        cached = time_per_call(lambda: module.build(data), args.iterations)
+        setup = time_per_call(lambda: legacy_setup(module), args.iterations)
+        line = f"{template_id:<10} {cached:>11.3f} ms {cached + setup:>11.3f} ms {setup:>10.3f} ms"
+        if args.render:
+            line += f" {time_per_call(lambda: render(module, data), args.iterations):>10.3f} ms"
+        print(line)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,530 @@
+# ==============================================================================
+# Cache backends used by run.py (resume data, last resume per user).
+#   - MemoryCache: bounded LRU/TTL dict, private to one worker process.
+#   - SQLiteCache: bounded LRU/TTL store in a local SQLite file that every
+#     gunicorn worker on the host shares. The file holds users' resume text and
+#     PDFs, so it is created owner-only (0600) in an app-owned directory, and a
+#     failing file (locked, full, corrupt) only ever costs a miss, never a request.
+# Pick one with make_cache(); CACHE_BACKEND=memory|sqlite sets the default.
+#
+# set(key, value, owner=user_id) also files the entry under its owner, so one
+# user's entries can be listed (keys_for) or dropped (invalidate_owner) without
+# scanning the cache. owner_max_entries / owner_max_bytes cap each owner: a new
+# entry evicts that owner's own least-recently-used entries first, so one heavy
+# user cannot push everyone else's results out.
+# ==============================================================================
+
+import json
+import logging
+import os
+import sqlite3
+import sys
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+log = logging.getLogger('resume_builder.cache')
+
+CACHE_BACKEND = os.environ.get('CACHE_BACKEND', 'sqlite')
+SHARED_CACHE_PATH = os.environ.get('SHARED_CACHE_PATH') or os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), 'instance', 'resume_builder_cache.db')
+
+
+def prepare_private_file(path):
+    """Create path (and any missing parent directories) readable by this user only."""
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, mode=0o700, exist_ok=True)
+    os.close(os.open(path, os.O_RDWR | os.O_CREAT, 0o600))
+    os.chmod(path, 0o600)  # files created by older builds were world-readable; SQLite copies this mode to -wal/-shm
+
+
+def approx_size(value):
+    """Rough byte size of a cached value (JSON length for plain data, getsizeof otherwise)."""
+    if isinstance(value, (bytes, bytearray)):
+        return len(value)
+    if isinstance(value, str):
+        return len(value.encode('utf-8'))
+    try:
+        return len(json.dumps(value, default=str))
+    except (TypeError, ValueError):
+        return sys.getsizeof(value)
+
+
+class CacheBackend:
+    """Interface every cache backend implements. Keys are strings or ints; values are JSON data or bytes.
+
+    Owners are compared as strings, so owner=42 and owner='42' are the same owner.
+    """
+
+    name = None
+
+    def get(self, key, default=None):
+        raise NotImplementedError
+
+    def set(self, key, value, ttl=None, owner=None):
+        raise NotImplementedError
+
+    def keys_for(self, owner):
+        """Live keys filed under owner, least recently used first."""
+        raise NotImplementedError
+
+    def invalidate_owner(self, owner):
+        """Delete every entry filed under owner; returns how many were removed."""
+        raise NotImplementedError
+
+    def delete(self, key):
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+    def stats(self):
+        raise NotImplementedError
+
+    def __contains__(self, key):
+        return self.get(key, _MISSING) is not _MISSING
+
+
+class MemoryCache(CacheBackend):
+    """Thread-safe LRU cache with optional TTL and caps on entry count and approximate bytes.
+
+    Entries are evicted least-recently-used first whenever either cap is exceeded;
+    expired entries are dropped lazily on access. Hit/miss/eviction counters are
+    exposed through stats() so the limits can be sized from production numbers.
+    """
+
+    def __init__(self, name, max_entries=1000, max_bytes=None, ttl=None, sizeof=approx_size,
+                 owner_max_entries=None, owner_max_bytes=None):
+        self.name = name
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.owner_max_entries = owner_max_entries
+        self.owner_max_bytes = owner_max_bytes
+        self._sizeof = sizeof
+        self._data = OrderedDict()  # key -> (value, size, expires_at, owner)
+        self._bytes = 0
+        self._owners = {}  # owner -> OrderedDict of that owner's keys, LRU first
+        self._owner_bytes = {}
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.evictions = self.expirations = self.rejected = self.owner_evictions = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            value, size, expires_at, owner = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                self._remove(key)
+                self.expirations += 1
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            if owner is not None:
+                self._owners[owner].move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, ttl=None, owner=None):
+        size = self._sizeof(value)
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = time.monotonic() + ttl if ttl else None
+        owner = None if owner is None else str(owner)
+        with self._lock:
+            if key in self._data:
+                self._remove(key)
+            if (self.max_bytes is not None and size > self.max_bytes) or (
+                    owner is not None and self.owner_max_bytes is not None and size > self.owner_max_bytes):
+                # Would evict everything else and still not fit; don't cache it at all.
+                self.rejected += 1
+                return False
+            self._data[key] = (value, size, expires_at, owner)
+            self._bytes += size
+            if owner is not None:
+                self._owners.setdefault(owner, OrderedDict())[key] = None
+                self._owner_bytes[owner] = self._owner_bytes.get(owner, 0) + size
+                self._evict_owner(owner)
+            self._evict()
+            return True
+
+    def keys_for(self, owner):
+        now = time.monotonic()
+        with self._lock:
+            keys = self._owners.get(str(owner), ())
+            return [key for key in keys if self._data[key][2] is None or self._data[key][2] > now]
+
+    def invalidate_owner(self, owner):
+        with self._lock:
+            keys = list(self._owners.get(str(owner), ()))
+            for key in keys:
+                self._remove(key)
+            return len(keys)
+
+    def delete(self, key):
+        with self._lock:
+            if key in self._data:
+                self._remove(key)
+                return True
+            return False
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+            self._owners.clear()
+            self._owner_bytes.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'backend': 'memory',
+                'entries': len(self._data),
+                'bytes': self._bytes,
+                'max_entries': self.max_entries,
+                'max_bytes': self.max_bytes,
+                'ttl': self.ttl,
+                'owners': len(self._owners),
+                'owner_max_entries': self.owner_max_entries,
+                'owner_max_bytes': self.owner_max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+                'evictions': self.evictions,
+                'owner_evictions': self.owner_evictions,
+                'expirations': self.expirations,
+                'rejected': self.rejected,
+            }
+
+    # --- internals (caller holds the lock) ---
+    def _remove(self, key):
+        _, size, _, owner = self._data.pop(key)
+        self._bytes -= size
+        if owner is not None:
+            keys = self._owners[owner]
+            del keys[key]
+            self._owner_bytes[owner] -= size
+            if not keys:
+                del self._owners[owner], self._owner_bytes[owner]
+
+    def _evict_owner(self, owner):
+        """Drop owner's least-recently-used entries until it is within its quota."""
+        keys = self._owners[owner]
+        while keys and (
+            (self.owner_max_entries is not None and len(keys) > self.owner_max_entries)
+            or (self.owner_max_bytes is not None and self._owner_bytes[owner] > self.owner_max_bytes)
+        ):
+            self._remove(next(iter(keys)))
+            self.owner_evictions += 1
+
+    def _evict(self):
+        while self._data and (
+            (self.max_entries is not None and len(self._data) > self.max_entries)
+            or (self.max_bytes is not None and self._bytes > self.max_bytes)
+        ):
+            key = next(iter(self._data))
+            self._remove(key)
+            self.evictions += 1
+
+
+class SQLiteCache(CacheBackend):
+    """LRU/TTL cache persisted in a local SQLite file shared by all worker processes on a host.
+
+    Each cache gets its own namespace inside one table. Writes run in IMMEDIATE
+    transactions under WAL, so readers in other workers never see a partial
+    entry. Hit/miss counters are per process; entries/bytes are read from the file.
+    """
+
+    def __init__(self, name, path=None, max_entries=1000, max_bytes=None, ttl=None, owner_max_entries=None, owner_max_bytes=None):
+        self.name = name
+        self.path = path or SHARED_CACHE_PATH
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.owner_max_entries = owner_max_entries
+        self.owner_max_bytes = owner_max_bytes
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.evictions = self.expirations = self.rejected = self.owner_evictions = 0
+        self.errors = 0
+        try:
+            prepare_private_file(self.path)
+        except OSError as e:
+            raise sqlite3.OperationalError(f"cannot create {self.path}: {e}") from e
+        conn = self._conn()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache_entries ("
+            " namespace TEXT NOT NULL, key TEXT NOT NULL, value BLOB NOT NULL, is_bytes INTEGER NOT NULL,"
+            " size INTEGER NOT NULL, expires_at REAL, accessed_at REAL NOT NULL, owner TEXT,"
+            " PRIMARY KEY (namespace, key))"
+        )
+        if 'owner' not in [row[1] for row in conn.execute("PRAGMA table_info(cache_entries)")]:
+            try:
+                conn.execute("ALTER TABLE cache_entries ADD COLUMN owner TEXT")  # files created before owners existed
+            except sqlite3.OperationalError:
+                pass  # another worker added it first
+        conn.execute("CREATE INDEX IF NOT EXISTS ix_cache_entries_lru ON cache_entries (namespace, accessed_at)")
+        conn.execute("CREATE INDEX IF NOT EXISTS ix_cache_entries_owner ON cache_entries (namespace, owner, accessed_at)")
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _count(self, attr):
+        with self._lock:
+            setattr(self, attr, getattr(self, attr) + 1)
+
+    def _failed(self, operation, error):
+        self._count('errors')
+        log.warning(f"⚠️ Cache '{self.name}' {operation} failed ({error}); carrying on without it.")
+
+    def get(self, key, default=None):
+        now = time.time()
+        try:
+            conn = self._conn()
+            row = conn.execute(
+                "SELECT value, is_bytes, expires_at FROM cache_entries WHERE namespace = ? AND key = ?",
+                (self.name, str(key)),
+            ).fetchone()
+            if row is None:
+                self._count('misses')
+                return default
+            value, is_bytes, expires_at = row
+            if expires_at is not None and expires_at <= now:
+                conn.execute("DELETE FROM cache_entries WHERE namespace = ? AND key = ?", (self.name, str(key)))
+                self._count('expirations')
+                self._count('misses')
+                return default
+            value = bytes(value) if is_bytes else json.loads(value)
+        except (sqlite3.Error, ValueError) as e:
+            self._failed('get', e)
+            self._count('misses')
+            return default
+        try:
+            conn.execute("UPDATE cache_entries SET accessed_at = ? WHERE namespace = ? AND key = ?", (now, self.name, str(key)))
+        except sqlite3.Error as e:
+            self._failed('touch', e)  # the value is still good; only its LRU position is stale
+        self._count('hits')
+        return value
+
+    def set(self, key, value, ttl=None, owner=None):
+        is_bytes = isinstance(value, (bytes, bytearray))
+        payload = bytes(value) if is_bytes else json.dumps(value, default=str).encode('utf-8')
+        owner = None if owner is None else str(owner)
+        if (self.max_bytes is not None and len(payload) > self.max_bytes) or (
+                owner is not None and self.owner_max_bytes is not None and len(payload) > self.owner_max_bytes):
+            self._count('rejected')
+            return False
+        ttl = self.ttl if ttl is None else ttl
+        now = time.time()
+        try:
+            conn = self._conn()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.execute(
+                    "INSERT OR REPLACE INTO cache_entries (namespace, key, value, is_bytes, size, expires_at, accessed_at, owner)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (self.name, str(key), payload, int(is_bytes), len(payload), now + ttl if ttl else None, now, owner),
+                )
+                if owner is not None:
+                    self._evict_owner(conn, owner)
+                self._evict(conn, now)
+                conn.execute("COMMIT")
+            except Exception:
+                if conn.in_transaction:
+                    conn.execute("ROLLBACK")
+                raise
+        except sqlite3.Error as e:
+            self._failed('set', e)
+            return False
+        return True
+
+    def delete(self, key):
+        try:
+            cur = self._conn().execute("DELETE FROM cache_entries WHERE namespace = ? AND key = ?", (self.name, str(key)))
+        except sqlite3.Error as e:
+            self._failed('delete', e)
+            return False
+        return cur.rowcount > 0
+
+    def keys_for(self, owner):
+        try:
+            rows = self._conn().execute(
+                "SELECT key FROM cache_entries WHERE namespace = ? AND owner = ? AND (expires_at IS NULL OR expires_at > ?)"
+                " ORDER BY accessed_at ASC", (self.name, str(owner), time.time()),
+            ).fetchall()
+        except sqlite3.Error as e:
+            self._failed('keys_for', e)
+            return []
+        return [row[0] for row in rows]
+
+    def invalidate_owner(self, owner):
+        try:
+            cur = self._conn().execute("DELETE FROM cache_entries WHERE namespace = ? AND owner = ?", (self.name, str(owner)))
+        except sqlite3.Error as e:
+            self._failed('invalidate_owner', e)
+            return 0
+        return cur.rowcount
+
+    def clear(self):
+        try:
+            self._conn().execute("DELETE FROM cache_entries WHERE namespace = ?", (self.name,))
+        except sqlite3.Error as e:
+            self._failed('clear', e)
+
+    def __len__(self):
+        try:
+            return self._conn().execute("SELECT COUNT(*) FROM cache_entries WHERE namespace = ?", (self.name,)).fetchone()[0]
+        except sqlite3.Error as e:
+            self._failed('len', e)
+            return 0
+
+    def stats(self):
+        try:
+            entries, total, owners = self._conn().execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0), COUNT(DISTINCT owner) FROM cache_entries WHERE namespace = ?", (self.name,)
+            ).fetchone()
+        except sqlite3.Error as e:
+            self._failed('stats', e)
+            entries = total = owners = None
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'backend': 'sqlite',
+                'path': self.path,
+                'entries': entries,
+                'bytes': total,
+                'max_entries': self.max_entries,
+                'max_bytes': self.max_bytes,
+                'ttl': self.ttl,
+                'owners': owners,
+                'owner_max_entries': self.owner_max_entries,
+                'owner_max_bytes': self.owner_max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+                'evictions': self.evictions,
+                'owner_evictions': self.owner_evictions,
+                'expirations': self.expirations,
+                'rejected': self.rejected,
+                'errors': self.errors,
+            }
+
+    def _evict_owner(self, conn, owner):
+        """Drop owner's least-recently-accessed rows until it is within its quota (inside the write txn)."""
+        if self.owner_max_entries is None and self.owner_max_bytes is None:
+            return
+        rows = conn.execute(
+            "SELECT key, size FROM cache_entries WHERE namespace = ? AND owner = ? ORDER BY accessed_at ASC", (self.name, owner)
+        ).fetchall()
+        entries, total = len(rows), sum(size for _, size in rows)
+        victims = []
+        for key, size in rows:
+            if not ((self.owner_max_entries is not None and entries > self.owner_max_entries)
+                    or (self.owner_max_bytes is not None and total > self.owner_max_bytes)):
+                break
+            victims.append((self.name, key))
+            entries -= 1
+            total -= size
+        if victims:
+            conn.executemany("DELETE FROM cache_entries WHERE namespace = ? AND key = ?", victims)
+            with self._lock:
+                self.owner_evictions += len(victims)
+
+    def _evict(self, conn, now):
+        """Drop expired rows, then least-recently-accessed rows until both caps hold (inside the write txn)."""
+        cur = conn.execute("DELETE FROM cache_entries WHERE namespace = ? AND expires_at IS NOT NULL AND expires_at <= ?", (self.name, now))
+        expired = cur.rowcount
+        entries, total = conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM cache_entries WHERE namespace = ?", (self.name,)
+        ).fetchone()
+        evicted = 0
+        if (self.max_entries is not None and entries > self.max_entries) or (self.max_bytes is not None and total > self.max_bytes):
+            rows = conn.execute(
+                "SELECT key, size FROM cache_entries WHERE namespace = ? ORDER BY accessed_at ASC", (self.name,)
+            ).fetchall()
+            victims = []
+            for key, size in rows:
+                if not ((self.max_entries is not None and entries > self.max_entries) or (self.max_bytes is not None and total > self.max_bytes)):
+                    break
+                victims.append((self.name, key))
+                entries -= 1
+                total -= size
+            conn.executemany("DELETE FROM cache_entries WHERE namespace = ? AND key = ?", victims)
+            evicted = len(victims)
+        with self._lock:
+            self.expirations += expired
+            self.evictions += evicted
+
+
+def make_cache(name, backend=None, **limits):
+    """Build a cache of the configured backend ('memory' or 'sqlite').
+
+    Falls back to an in-process MemoryCache if the shared SQLite file cannot be opened,
+    so a read-only or misconfigured disk degrades caching instead of breaking startup.
+    """
+    backend = backend or CACHE_BACKEND
+    if backend == 'sqlite':
+        try:
+            return SQLiteCache(name, **limits)
+        except sqlite3.Error as e:
+            log.warning(f"⚠️ WARNING: Shared cache at {SHARED_CACHE_PATH} unavailable ({e}); using in-process cache for '{name}'.")
+    elif backend != 'memory':
+        raise ValueError(f"Unknown cache backend: {backend}")
+    limits.pop('path', None)
+    return MemoryCache(name, **limits)
+
+
+class SingleFlight:
+    """Coalesce concurrent calls that share a key within this process.
+
+    The first caller for a key runs the function; callers arriving while it is
+    in flight block on the same Future and receive its result (or exception).
+    Nothing is remembered once the call finishes; caching is the caller's job.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.leaders = self.followers = 0
+
+    def do(self, key, fn, *args, **kwargs):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = Future()
+                self.leaders += 1
+            else:
+                self.followers += 1
+        if not leader:
+            return call.result()
+        try:
+            result = fn(*args, **kwargs)
+            call.set_result(result)
+            return result
+        except BaseException as e:
+            call.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+    def stats(self):
+        with self._lock:
+            return {'in_flight': len(self._calls), 'leaders': self.leaders, 'coalesced': self.followers}
+
+
+_MISSING = object()
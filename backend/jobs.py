@@ -0,0 +1,74 @@
+# ==============================================================================
+# Background jobs for slow /api/generate-pdf work (submit now, poll later).
+#
+# Work runs on a bounded thread pool inside each worker process. Job records
+# and finished PDFs are kept in a cache backend (the shared SQLite store by
+# default), so a poll that lands on a different gunicorn worker still sees
+# the job's status and result.
+# ==============================================================================
+
+import logging
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from cache import make_cache
+
+log = logging.getLogger('resume_builder.jobs')
+
+
+class JobQueueFullError(Exception):
+    """Raised by submit() when max_pending jobs are already queued or running in this process."""
+
+
+class JobStore:
+    def __init__(self, name, max_workers=2, max_pending=16, ttl=3600, max_result_bytes=64 * 1024 * 1024):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self.records = make_cache(f'{name}_records', max_entries=max_pending * 64, ttl=ttl)
+        self.results = make_cache(f'{name}_results', max_entries=max_pending * 16, max_bytes=max_result_bytes, ttl=ttl)
+
+    def submit(self, owner, fn, *args, meta=None):
+        """Queue fn(*args), which must return bytes; returns the new job id.
+
+        meta is stored on the job record (e.g. the template id) for the status/result routes.
+        """
+        if not self._slots.acquire(blocking=False):
+            raise JobQueueFullError("Too many jobs in progress, try again shortly")
+        job_id = uuid.uuid4().hex
+        self._update(job_id, **(meta or {}), owner=owner, status='queued', created_at=time.time())
+        try:
+            self._executor.submit(self._run, job_id, fn, args)
+        except Exception:
+            self._slots.release()
+            raise
+        return job_id
+
+    def get(self, job_id, owner):
+        """Job record for job_id, or None if it doesn't exist, expired, or belongs to someone else."""
+        record = self.records.get(job_id)
+        if not record or record.get('owner') != owner:
+            return None
+        return record
+
+    def result(self, job_id):
+        return self.results.get(job_id)
+
+    def _update(self, job_id, **fields):
+        record = self.records.get(job_id) or {'job_id': job_id}
+        record.update(fields)
+        self.records.set(job_id, record)
+
+    def _run(self, job_id, fn, args):
+        try:
+            self._update(job_id, status='running', started_at=time.time())
+            output = fn(*args)
+            if not self.results.set(job_id, output):
+                raise RuntimeError("Job result is too large to store")
+            self._update(job_id, status='done', finished_at=time.time())
+        except Exception as e:
+            log.exception(f"❌ Job {job_id[:8]} failed: {e}")
+            self._update(job_id, status='failed', error=str(e), finished_at=time.time())
+        finally:
+            self._slots.release()
@@ -0,0 +1,139 @@
+# ==============================================================================
+# In-process metrics rendered in the Prometheus text format (/api/metrics).
+#
+# span('stage', template=...) times a block into a latency histogram; counters
+# track LLM calls and token usage. Values live in this worker process only, so
+# scrape each gunicorn worker (or sum them) the way you would any per-process
+# exporter. No external dependency: this is a few dicts behind a lock.
+# ==============================================================================
+
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+log = logging.getLogger('resume_builder.metrics')
+
+# Seconds; spans range from sub-millisecond cache hits to minute-long LLM calls.
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _label_text(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{k}="{_escape(v)}"' for k, v in labels) + '}'
+
+
+def _number(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name, help_text, label_names=()):
+        self.name, self.help, self.label_names = name, help_text, tuple(label_names)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple((name, labels.get(name, '')) for name in self.label_names)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_label_text(key)} {_number(value)}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help_text, label_names=(), buckets=DEFAULT_BUCKETS):
+        self.name, self.help, self.label_names = name, help_text, tuple(label_names)
+        self.buckets = tuple(sorted(buckets)) + (float('inf'),)
+        self._series = {}  # label key -> [per-bucket counts, sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple((name, labels.get(name, '')) for name in self.label_names)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][i] += 1
+                    break
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, (counts, total, count) in sorted(self._series.items()):
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets, counts):
+                    cumulative += bucket_count
+                    lines.append(f"{self.name}_bucket{_label_text(key + (('le', _number(bound)),))} {cumulative}")
+                lines.append(f"{self.name}_sum{_label_text(key)} {_number(total)}")
+                lines.append(f"{self.name}_count{_label_text(key)} {count}")
+        return lines
+
+
+STAGE_SECONDS = Histogram('resume_stage_duration_seconds', 'Time spent in each pipeline stage.', ('stage', 'template'))
+HTTP_SECONDS = Histogram('resume_http_request_duration_seconds', 'Time to response headers per endpoint (streams excluded).', ('endpoint', 'method', 'status'))
+LLM_CALLS = Counter('resume_llm_calls_total', 'OpenAI chat completions by outcome (ok, error, cached).', ('model', 'outcome'))
+LLM_TOKENS = Counter('resume_llm_tokens_total', 'OpenAI tokens reported in completion.usage.', ('model', 'kind'))
+STAGE_ERRORS = Counter('resume_stage_errors_total', 'Spans that ended with an exception.', ('stage', 'template'))
+
+METRICS = [STAGE_SECONDS, HTTP_SECONDS, LLM_CALLS, LLM_TOKENS, STAGE_ERRORS]
+
+
+@contextmanager
+def span(stage, template='', timings=None):
+    """Time the enclosed block into resume_stage_duration_seconds{stage, template} (and timings[stage] if given)."""
+    start = time.perf_counter()
+    try:
+        yield
+    except BaseException:
+        STAGE_ERRORS.inc(stage=stage, template=template)
+        raise
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_SECONDS.observe(elapsed, stage=stage, template=template)
+        if timings is not None:
+            timings[stage] = elapsed
+        log.debug("span %s%s took %.4fs", stage, f" [{template}]" if template else '', elapsed)
+
+
+def record_usage(model, usage):
+    """Add a completion.usage object (may be None) to the token counters."""
+    if usage is None:
+        return
+    for kind in ('prompt_tokens', 'completion_tokens'):
+        tokens = getattr(usage, kind, None)
+        if tokens:
+            LLM_TOKENS.inc(tokens, model=model, kind=kind.split('_')[0])
+
+
+def gauge_lines(name, help_text, samples):
+    """Prometheus lines for a gauge from [(labels dict, value)] pairs, for values owned elsewhere (cache stats)."""
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} gauge"]
+    for labels, value in samples:
+        if value is not None:
+            lines.append(f"{name}{_label_text(tuple(sorted(labels.items())))} {_number(value)}")
+    return lines
+
+
+def render(extra_lines=()):
+    lines = []
+    for metric in METRICS:
+        lines.extend(metric.render())
+    lines.extend(extra_lines)
+    return "\n".join(lines) + "\n"
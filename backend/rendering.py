@@ -0,0 +1,358 @@
+# ==============================================================================
+# PDF rendering, importable without run.py (no Flask app, DB or OpenAI client),
+# so worker processes can render while the web process keeps serving requests.
+#
+#   normalize_resume_for_template(template_id, data)  canonical data -> template view
+#   render_pdf(template_id, resume_data, ...)         canonical data -> PDF bytes
+#   RenderService                                     render_pdf on a bounded, warm
+#                                                     pool of worker processes
+# ==============================================================================
+
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import CancelledError, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from io import BytesIO
+
+from reportlab.platypus import SimpleDocTemplate
+
+import metrics
+from cache import MemoryCache
+from resume_model import Resume, as_tuple
+from templates import get_template
+
+log = logging.getLogger('resume_builder.rendering')
+
+# RENDER_MODE=process (default) renders on worker processes; inline renders in the request thread.
+RENDER_MODES = ('process', 'inline')
+RENDER_MODE = os.environ.get('RENDER_MODE', 'process')
+# Worker processes per web process, and how many renders may be queued or running before new ones get a 503.
+RENDER_PROCESSES = int(os.environ.get('RENDER_PROCESSES', str(min(4, os.cpu_count() or 1))))
+RENDER_MAX_QUEUE = int(os.environ.get('RENDER_MAX_QUEUE', str(RENDER_PROCESSES * 4)))
+# Seconds to wait for one render before giving up on it.
+RENDER_TIMEOUT = float(os.environ.get('RENDER_TIMEOUT', '60'))
+# Normalized per-template views kept per process, keyed by template and canonical data hash.
+RENDER_VIEW_CACHE_ENTRIES = int(os.environ.get('RENDER_VIEW_CACHE_ENTRIES', '256'))
+
+# Views share their sections with the cached resume data, so only the entry count is bounded.
+_views = MemoryCache('template_views', max_entries=RENDER_VIEW_CACHE_ENTRIES, sizeof=lambda value: 0)
+
+
+class TemplateBuildError(Exception):
+    """A template's build() raised while turning resume data into a story."""
+
+
+class RenderQueueFullError(Exception):
+    """Raised by RenderService when max_queue renders are already queued or running in this process."""
+
+
+def contact_list_to_dict(contact, keys):
+    """Map a positional contact list onto keys; dicts pass through, anything else becomes {}."""
+    if not isinstance(contact, list):
+        return contact if isinstance(contact, dict) else {}
+    return dict(zip(keys, contact))
+
+
+def _template3_view(resume):
+    # Expect: contact dict with Phone, Website, Email; duties/details as strings
+    view = dict(resume.source)
+    view['contact'] = contact_list_to_dict(resume.contact, ["Phone", "Website", "Email"])
+    work = []
+    for item in resume.work:
+        if isinstance(item, dict):
+            duties = item.get('duties')
+            work.append({**item, 'duties': "\n".join(duties)} if isinstance(duties, list) else item)
+        else:
+            work.append({'company': str(item), 'duties': str(item)})
+    view['work_experience'] = work
+    education = []
+    for item in resume.education:
+        if isinstance(item, dict):
+            details = item.get('details')
+            education.append({**item, 'details': "\n".join(details)} if isinstance(details, list) else item)
+        else:
+            education.append({'university': str(item), 'details': str(item)})
+    view['education'] = education
+    view['skills'] = list(resume.skills)
+    if not isinstance(view.get('hobbies', []), list):
+        view['hobbies'] = list(as_tuple(view['hobbies']))
+    view['profile'] = resume.summary
+    return view
+
+
+def _template4_view(resume):
+    # Expect: contact dict with lower-case keys; short lists so the two-column layout fits one page
+    view = dict(resume.source)
+    contact = contact_list_to_dict(resume.contact, ["Phone", "Email", "Location", "LinkedIn"])
+    view['contact'] = {
+        'phone': contact.get('Phone', ''),
+        'email': contact.get('Email', ''),
+        'address': contact.get('Location', ''),
+        'website': contact.get('LinkedIn', '')
+    }
+    work = []
+    for item in resume.work[:2]:
+        if isinstance(item, dict):
+            work.append({**item, 'duties': list(as_tuple(item.get('duties')))[:3]})
+        else:
+            work.append({'company': str(item), 'duties': [str(item)]})
+    view['work_experience'] = work
+    education = []
+    for item in resume.education[:2]:
+        if isinstance(item, dict):
+            education.append({**item, 'details': list(as_tuple(item.get('details')))[:2]})
+        else:
+            education.append({'degree': str(item), 'details': [str(item)]})
+    view['education'] = education
+    view['skills'] = list(resume.skills[:10])
+    view['languages'] = [l if isinstance(l, dict) else {'language': str(l), 'level': 'Fluent'} for l in as_tuple(resume.source.get('languages'))]
+    view['profile_summary'] = resume.summary
+    return view
+
+
+# Templates not listed here (template1) take the canonical data as is.
+TEMPLATE_VIEWS = {
+    'template3': _template3_view,
+    'template4': _template4_view,
+}
+
+
+def normalize_resume_for_template(template_id, data):
+    """Best-effort adapter so one canonical resume payload can render in all templates.
+
+    Returns a new top-level dict whose unchanged sections are shared with data, so
+    neither data nor the result may be mutated.
+    """
+    resume = Resume.wrap(data if isinstance(data, dict) else {})
+    view = TEMPLATE_VIEWS.get(template_id)
+    return view(resume) if view else resume.source
+
+
+def template_view(template_id, resume_data, data_hash=None):
+    """normalize_resume_for_template, memoized per (data_hash, template) when the caller has the hash."""
+    if data_hash is None:
+        return normalize_resume_for_template(template_id, resume_data)
+    key = f"{template_id}:{data_hash}"
+    view = _views.get(key)
+    if view is None:
+        view = normalize_resume_for_template(template_id, resume_data)
+        _views.set(key, view)
+    return view
+
+
+def render_pdf(template_id, resume_data, timings=None, data_hash=None):
+    """Normalize canonical resume_data for template_id, build it and return the PDF bytes.
+
+    Stage durations are recorded as metrics spans and, if given, into timings. With
+    data_hash (the canonical hash of resume_data) the normalized view is memoized.
+    """
+    template = get_template(template_id)
+    # Normalize cached data for the specific template to avoid schema mismatches
+    with metrics.span('normalize', template_id, timings):
+        resume_data_for_template = template_view(template_id, resume_data, data_hash)
+
+    buffer = BytesIO()
+    try:
+        with metrics.span('template_build', template_id, timings):
+            build_result = template.build(resume_data_for_template)
+        log.debug(f"✅ Story generated successfully for {template_id}")
+    except Exception as template_error:
+        log.exception(f"❌ ERROR building template {template_id}: {template_error}")
+        raise TemplateBuildError(str(template_error)) from template_error
+
+    with metrics.span('doc_build', template_id, timings):
+        if template.build_mode == 'canvas':
+            # Canvas templates return a function that draws straight into the buffer
+            build_result(buffer)
+        else:
+            # Story templates return the flowables list
+            doc = SimpleDocTemplate(buffer, **template.page_settings)
+            doc.build(build_result)
+    return buffer.getvalue()
+
+
+def _render_job(template_id, resume_data, data_hash=None):
+    """Worker-process entry point; returns the stage timings too, since the worker's own metrics never reach /api/metrics."""
+    timings = {}
+    return render_pdf(template_id, resume_data, timings, data_hash), timings
+
+
+def _warm_job():
+    return os.getpid()
+
+
+def _mp_context():
+    """forkserver children start from a clean process that has already imported this
+    module (ReportLab, templates), so a new worker is cheap and never inherits the web
+    process's threads, DB connections or sockets. (Started as `python run.py`,
+    multiprocessing also re-imports run.py in each worker, as __mp_main__; run.py's
+    RENDER_WORKER flag skips its clients, caches, threads and DB setup there. Under
+    gunicorn only this module is loaded.)"""
+    if 'forkserver' in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context('forkserver')
+        context.set_forkserver_preload([__name__])
+        return context
+    return multiprocessing.get_context('spawn')
+
+
+class RenderService:
+    """Renders PDFs on a warm pool of worker processes, so ReportLab layout (pure Python,
+    CPU-bound) runs on other cores instead of holding this web process's GIL.
+
+    At most max_queue renders are queued or running per web process; past that,
+    render() raises RenderQueueFullError (or waits, with block=True). If a worker
+    dies (segfault, OOM kill) the pool is replaced and the render retried once; a
+    render still running after timeout seconds gets its pool's processes killed and
+    replaced, so one bad job never takes the web process or later renders down with it.
+    mode='inline' renders in the calling thread instead (the old behaviour).
+    """
+
+    def __init__(self, processes=RENDER_PROCESSES, max_queue=RENDER_MAX_QUEUE, mode=RENDER_MODE, timeout=RENDER_TIMEOUT):
+        if mode not in RENDER_MODES:
+            raise ValueError(f"Unknown RENDER_MODE {mode!r}; expected one of {RENDER_MODES}")
+        self.processes, self.max_queue, self.mode, self.timeout = processes, max_queue, mode, timeout
+        self._pool = None
+        self._pool_pid = None
+        self._lock = threading.Lock()
+        self._slots = threading.Condition()
+        self.in_flight = 0
+        self.rendered = self.rejected = self.failed = self.restarts = 0
+
+    def warm(self):
+        """Start every worker process now (in the background) instead of on the first render."""
+        # Workers re-import the entry script (e.g. run.py) while bootstrapping; they must not start
+        # pools of their own. _inheriting is the flag multiprocessing itself checks for this.
+        if self.mode != 'process' or getattr(multiprocessing.current_process(), '_inheriting', False):
+            return
+        executor = self._executor()
+        for _ in range(self.processes):
+            executor.submit(_warm_job)
+
+    def render(self, template_id, resume_data, block=False, data_hash=None):
+        """PDF bytes for one template. Raises RenderQueueFullError, TemplateBuildError or TimeoutError.
+
+        data_hash, the canonical hash of resume_data, lets workers reuse a normalized view.
+        """
+        self._reserve(1, block)
+        try:
+            if self.mode == 'inline':
+                pdf_bytes = render_pdf(template_id, resume_data, data_hash=data_hash)
+            else:
+                pdf_bytes = self._collect(template_id, resume_data, data_hash, *self._submit(template_id, resume_data, data_hash))
+            self._count('rendered')
+            return pdf_bytes
+        except Exception:
+            self._count('failed')
+            raise
+        finally:
+            self._release(1)
+
+    def render_many(self, template_ids, resume_data, block=False, data_hash=None):
+        """Render resume_data in every template concurrently, one worker per template.
+
+        Returns (pdfs, errors): {template_id: bytes} for the ones that rendered and
+        {template_id: message} for the ones that failed. Wall time tracks the slowest template.
+        """
+        self._reserve(len(template_ids), block)
+        try:
+            if self.mode == 'inline':
+                jobs = [(template_id, None) for template_id in template_ids]
+            else:
+                jobs = [(template_id, self._submit(template_id, resume_data, data_hash)) for template_id in template_ids]
+            pdfs, errors = {}, {}
+            for template_id, job in jobs:
+                try:
+                    if job is None:
+                        pdfs[template_id] = render_pdf(template_id, resume_data, data_hash=data_hash)
+                    else:
+                        pdfs[template_id] = self._collect(template_id, resume_data, data_hash, *job)
+                    self._count('rendered')
+                except TemplateBuildError as e:
+                    self._count('failed')
+                    errors[template_id] = str(e)
+                except TimeoutError:
+                    self._count('failed')
+                    raise
+            return pdfs, errors
+        finally:
+            self._release(len(template_ids))
+
+    def stats(self):
+        with self._slots:
+            return {
+                'mode': self.mode,
+                'processes': self.processes,
+                'max_queue': self.max_queue,
+                'in_flight': self.in_flight,
+                'rendered': self.rendered,
+                'failed': self.failed,
+                'rejected': self.rejected,
+                'pool_restarts': self.restarts,
+            }
+
+    # --- internals ---
+    def _executor(self):
+        with self._lock:
+            # A pool created before a fork (gunicorn --preload) has no live manager thread in the child.
+            if self._pool is None or self._pool_pid != os.getpid():
+                self._pool = ProcessPoolExecutor(max_workers=self.processes, mp_context=_mp_context())
+                self._pool_pid = os.getpid()
+            return self._pool
+
+    def _submit(self, template_id, resume_data, data_hash):
+        pool = self._executor()
+        return pool, pool.submit(_render_job, template_id, resume_data, data_hash)
+
+    def _collect(self, template_id, resume_data, data_hash, pool, future):
+        """Wait for a worker's result; on a dead pool, replace it and retry the render once.
+
+        On a timeout the worker is still busy with the render, so the pool is killed and
+        replaced (other renders on it are retried on the new pool) and TimeoutError raised.
+        """
+        try:
+            try:
+                pdf_bytes, timings = future.result(timeout=self.timeout)
+            except (BrokenProcessPool, CancelledError):  # CancelledError: queued on a pool killed by a timeout
+                self._replace_pool(pool, "A render worker process died")
+                pool, future = self._submit(template_id, resume_data, data_hash)
+                pdf_bytes, timings = future.result(timeout=self.timeout)
+        except TimeoutError:
+            self._replace_pool(pool, f"A {template_id} render ran past {self.timeout:g}s", terminate=True)
+            raise
+        for stage, seconds in timings.items():
+            metrics.STAGE_SECONDS.observe(seconds, stage=stage, template=template_id)
+        return pdf_bytes
+
+    def _replace_pool(self, pool, reason, terminate=False):
+        with self._lock:
+            if self._pool is not pool:
+                return  # another thread already replaced it
+            self._pool = None
+            self.restarts += 1
+        log.warning(f"⚠️ {reason}; starting a fresh render pool.")
+        # shutdown() never stops a running job; a hung render has to be killed
+        if terminate:
+            for process in list((pool._processes or {}).values()):
+                process.terminate()
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    def _reserve(self, count, block):
+        with self._slots:
+            # A batch bigger than the whole queue is still allowed when nothing else is running.
+            while self.in_flight and self.in_flight + count > self.max_queue:
+                if not block:
+                    self.rejected += 1
+                    raise RenderQueueFullError("Too many PDFs rendering right now, try again shortly")
+                self._slots.wait()
+            self.in_flight += count
+
+    def _release(self, count):
+        with self._slots:
+            self.in_flight -= count
+            self._slots.notify_all()
+
+    def _count(self, attr):
+        with self._slots:
+            setattr(self, attr, getattr(self, attr) + 1)
@@ -0,0 +1,84 @@
+# ==============================================================================
+# Canonical resume model: the template1-schema JSON that generation produces,
+# checked once and held as a compact, read-only record.
+#
+#   Resume.from_data(data)   validate a generated/stored dict -> Resume
+#   Resume.wrap(data)        the same record without the content checks (rendering)
+#
+# A Resume keeps references into the original dict instead of copying it, so
+# building one is cheap enough to do per render; the per-template views in
+# rendering.py are built from it the same way. Nothing here may mutate data.
+# ==============================================================================
+
+from dataclasses import dataclass
+
+
+class InvalidResumeError(ValueError):
+    """Resume data is not a JSON object, is a generation error payload, or has no content."""
+
+
+# generate_full_resume_text's old failure payloads: {"name": "Error", "summary": "Failed to ..."}
+def is_error_payload(data):
+    return data.get('name') == 'Error' and str(data.get('summary') or '').startswith('Failed to')
+
+
+def as_tuple(value):
+    """Lists pass through as tuples, other truthy values become a 1-tuple, falsy values ()."""
+    if isinstance(value, list):
+        return tuple(value)
+    return (value,) if value else ()
+
+
+def flatten_skills(skills):
+    """Skills as one flat tuple, whether given as a list or {"Technical Skills": [...], ...}."""
+    if isinstance(skills, dict):
+        flat = []
+        for items in skills.values():
+            if isinstance(items, list):
+                flat.extend(items)
+            else:
+                flat.append(str(items))
+        return tuple(flat)
+    if isinstance(skills, list):
+        return tuple(skills)
+    return (str(skills),) if skills else ()
+
+
+@dataclass(frozen=True, slots=True)
+class Resume:
+    source: dict        # the JSON object as generated (shared, never copied)
+    name: str
+    summary: str
+    contact: object     # dict or list, as generated; templates map it to their own keys
+    work: tuple         # experience entries (dicts, or strings from a sloppy extraction)
+    education: tuple
+    skills: tuple       # flattened once
+
+    @property
+    def has_content(self):
+        return bool(self.summary or self.work or self.education or self.skills or self.source.get('projects'))
+
+    @classmethod
+    def from_data(cls, data):
+        """Resume for data that is about to be cached or stored; raises InvalidResumeError if it is unusable."""
+        resume = cls.wrap(data)
+        if is_error_payload(data):
+            raise InvalidResumeError(f"Resume data is a generation error: {data.get('summary')}")
+        if not resume.has_content:
+            raise InvalidResumeError("Resume data has no summary, experience, education or skills")
+        return resume
+
+    @classmethod
+    def wrap(cls, data):
+        """Resume over data with only the shape checked (JSON object); for data validated upstream."""
+        if not isinstance(data, dict):
+            raise InvalidResumeError(f"Resume data must be a JSON object, got {type(data).__name__}")
+        return cls(
+            source=data,
+            name=str(data.get('name') or ''),
+            summary=data.get('summary') or data.get('profile') or data.get('profile_summary') or '',
+            contact=data.get('contact', []),
+            work=as_tuple(data.get('work_experience') or data.get('experience')),
+            education=as_tuple(data.get('education')),
+            skills=flatten_skills(data.get('skills', [])),
+        )
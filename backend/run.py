@@ -6,44 +6,99 @@ import os
 import re
 import sys
 import hashlib
-sys.path.append(os.path.join(os.path.dirname(__file__), 'templates'))
-from templates import *
-import traceback
-from flask import Flask, jsonify, request, send_file
+from templates import TEMPLATES, get_template
+from flask import Flask, Response, g, jsonify, request, send_file, stream_with_context
 # ... (all other imports are correct and unchanged)
 from flask_cors import CORS
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy.exc import IntegrityError
 from flask_login import LoginManager, UserMixin, login_user, logout_user, current_user, login_required
 from flask_bcrypt import Bcrypt
 from dotenv import load_dotenv
 import PyPDF2
 import docx
+from docx.oxml.ns import qn
+from docx.table import Table
+from docx.text.paragraph import Paragraph
 import json
-import importlib
 import copy
-from reportlab.lib.pagesizes import letter
-from reportlab.platypus import SimpleDocTemplate
+import time
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
 from io import BytesIO
 from json_repair import repair_json
-from openai import OpenAI
+from openai import APIConnectionError, InternalServerError, OpenAI, RateLimitError
 import smtplib
+import random
+import uuid
+import zipfile
+import zlib
+from collections import namedtuple
+from datetime import datetime, timedelta, timezone
+import atexit
+import logging
+from logging.handlers import QueueHandler, QueueListener
+from queue import Queue
+from cache import SingleFlight, make_cache
+from jobs import JobQueueFullError, JobStore
+import metrics
+from rendering import RenderQueueFullError, RenderService, TemplateBuildError
+from resume_model import InvalidResumeError, Resume
+from uploads import StreamingUploadRequest, stream_sha256
+from werkzeug.exceptions import HTTPException, RequestEntityTooLarge
+import scoring
 
-print("--- Backend Script Initializing (OpenAI API Mode) ---")
 load_dotenv()
 
+# Started as `python run.py`, every render worker process re-imports this script as __mp_main__
+# while bootstrapping (multiprocessing does that for spawn/forkserver children). Workers only run
+# (the one guarded 'App-process services' block below).
+# (one guarded block, 'App-process services' below); only logging picks a quieter path.
+RENDER_WORKER = __name__ == '__mp_main__'
+
+# LOG_LEVEL=DEBUG adds per-span timings, score details and OpenAI request traces.
+LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO').upper()
+
+def configure_logging():
+    """Send every 'resume_builder' logger through a queue; one listener thread writes to stdout,
+    so request threads never block on a slow or piped console."""
+    logger = logging.getLogger('resume_builder')
+    logger.setLevel(LOG_LEVEL)
+    if not logger.handlers:
+        log_queue = Queue(-1)
+        console = logging.StreamHandler(sys.stdout)
+        console.setFormatter(logging.Formatter('%(asctime)s %(levelname)s [%(threadName)s] %(message)s'))
+        listener = QueueListener(log_queue, console, respect_handler_level=True)
+        logger.addHandler(QueueHandler(log_queue))
+        logger.propagate = False
+        listener.start()
+        atexit.register(listener.stop)
+    return logger
+
+log = logging.getLogger('resume_builder') if RENDER_WORKER else configure_logging()
+log.info("--- Backend Script Initializing (OpenAI API Mode) ---")
+
 app = Flask(__name__)
+# Uploads stream into spooled temp files and are SHA-256 hashed as they arrive (uploads.py);
+# bodies over MAX_UPLOAD_MB are refused with a 413 before (or while) they are read.
+app.request_class = StreamingUploadRequest
+MAX_UPLOAD_MB = float(os.environ.get('MAX_UPLOAD_MB', '10'))
+app.config['MAX_CONTENT_LENGTH'] = int(MAX_UPLOAD_MB * 1024 * 1024)
 # Allow all origins temporarily so your live frontend works immediately
-CORS(app, resources={r"/api/*": {"origins": ["https://resume-builder-live.vercel.app"]}}, supports_credentials=True)
+CORS(app, resources={r"/api/*": {"origins": ["https://resume-builder-live.vercel.app"]}}, supports_credentials=True, expose_headers=["X-Failed-Templates"])
 bcrypt = Bcrypt(app)
 login_manager = LoginManager(app)
 login_manager.init_app(app)
 
-try:
-    openai_client = OpenAI()
-    print("✅ OpenAI client initialized successfully.")
-except Exception as e:
-    print(f"FATAL ERROR: Could not initialize OpenAI client. Is OPENAI_API_KEY set in .env? Error: {e}")
-    sys.exit(1)
+# Timeout (seconds) for one OpenAI request attempt. Rate limits, timeouts and 5xx are retried up to
+# LLM_MAX_RETRIES times with backoff (create_completion), but the whole call, retries included, ends
+# by LLM_TOTAL_TIMEOUT; that is also how long a route waits on a pooled call.
+LLM_CALL_TIMEOUT = float(os.environ.get('LLM_CALL_TIMEOUT', '60'))
+LLM_MAX_RETRIES = int(os.environ.get('LLM_MAX_RETRIES', '2'))
+LLM_TOTAL_TIMEOUT = float(os.environ.get('LLM_TOTAL_TIMEOUT', str(LLM_CALL_TIMEOUT + 30)))
+# Set LLM_CONCURRENT_MODE=0 to run independent LLM calls one after another (old behaviour).
+LLM_CONCURRENT_MODE = os.environ.get('LLM_CONCURRENT_MODE', '1') != '0'
+llm_executor = ThreadPoolExecutor(max_workers=int(os.environ.get('LLM_MAX_WORKERS', '8')), thread_name_prefix='llm')
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 # Use PostgreSQL if available (Live), else fall back to SQLite (Local)
@@ -62,274 +117,551 @@ db = SQLAlchemy(app)
 @app.route("/api")
 def api_root(): return jsonify({"message": "API is running!"})
 
+@app.errorhandler(RequestEntityTooLarge)
+def upload_too_large(error):
+    return jsonify({'error': f'Upload too large, the limit is {MAX_UPLOAD_MB:g} MB'}), 413
+
+@app.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+
+@app.before_request
+def enforce_upload_limit():
+    """413 oversized bodies (uploads or JSON) before any view runs (the views' broad except blocks would turn it into a 500)."""
+    if request.content_length is not None:
+        if request.content_length > app.config['MAX_CONTENT_LENGTH']:
+            raise RequestEntityTooLarge()
+    elif request.mimetype == 'multipart/form-data' and current_user.is_authenticated:
+        # Chunked upload: parse it here, so the size cap trips here too. Only for signed-in users;
+        # anyone else gets login_required's 401 without the body being read at all.
+        request.files
+
+@app.after_request
+def record_request_duration(response):
+    start = g.pop('request_start', None)
+    if start is not None and request.endpoint:
+        metrics.HTTP_SECONDS.observe(time.perf_counter() - start, endpoint=request.endpoint, method=request.method, status=response.status_code)
+    return response
+
 class User(UserMixin, db.Model):
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(80), unique=True, nullable=False)
     password_hash = db.Column(db.String(60), nullable=False)
 
+class ResumeRecord(db.Model):
+    """Generated canonical resume data, kept in the database so restarts and deploys don't re-run the LLM steps."""
+    id = db.Column(db.Integer, primary_key=True)
+    cache_key = db.Column(db.String(64), unique=True, nullable=False, index=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
+    payload = db.Column(db.LargeBinary, nullable=False)  # zlib-compressed canonical JSON
+    created_at = db.Column(db.DateTime, nullable=False)
+    last_accessed_at = db.Column(db.DateTime, nullable=False, index=True)
+
+class ResumeUpload(db.Model):
+    """An uploaded resume's extracted text; later requests send its id (resumeId) instead of the file."""
+    __table_args__ = (db.UniqueConstraint('user_id', 'file_sha256'),)
+    id = db.Column(db.String(32), primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
+    file_name = db.Column(db.String(255), nullable=False)
+    file_sha256 = db.Column(db.String(64), nullable=False)
+    text = db.Column(db.Text, nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False, index=True)
+
 @login_manager.user_loader
 def load_user(user_id):
     with app.app_context(): return User.query.get(int(user_id))
 
 bert_model = None
-# Global cache for generated resume data (in-memory cache per user session)
-resume_data_cache = {}
-last_resume_cache = {}  # per-user last successful resume_data with its cache_key
+# Database tier behind resume_data_cache (ResumeRecord): survives restarts, pruned by last access.
+RESUME_RECORDS = os.environ.get('RESUME_RECORDS', '1') != '0'
+RESUME_RECORD_MAX_AGE = timedelta(days=float(os.environ.get('RESUME_RECORD_MAX_AGE_DAYS', '30')))
+# last_accessed_at is only rewritten when older than this, so cache hits don't each cost a write.
+RESUME_RECORD_TOUCH_INTERVAL = timedelta(seconds=float(os.environ.get('RESUME_RECORD_TOUCH_INTERVAL', '3600')))
+RESUME_RECORD_PRUNE_INTERVAL = float(os.environ.get('RESUME_RECORD_PRUNE_INTERVAL', '3600'))  # seconds between prunes per worker
+# Uploaded resumes (ResumeUpload) are dropped this long after upload; clients then upload again.
+RESUME_UPLOAD_MAX_AGE = timedelta(days=float(os.environ.get('RESUME_UPLOAD_MAX_AGE_DAYS', '7')))
+resume_record_stats = {'hits': 0, 'misses': 0, 'writes': 0, 'pruned': 0, 'errors': 0}
+resume_record_stats_lock = threading.Lock()
+last_record_prune = [0.0]
 
 def ensure_models_ready():
     """Do nothing - we are using OpenAI now to save memory."""
     pass
 
 def configure_ai_and_models():
-    print("✅ Generative AI is accessed via the OpenAI API (Lightweight Mode).")
-    
-def extract_text_from_file(file_stream, file_name):
-    # This function is unchanged
-    text = ""
+    log.info("✅ Generative AI is accessed via the OpenAI API (Lightweight Mode).")
+    log.info(f"✅ Templates registered: {', '.join(TEMPLATES)}")
+
+# Prompt-level cache inside generate_with_openai (openai_response_cache below).
+OPENAI_RESPONSE_CACHE = os.environ.get('OPENAI_RESPONSE_CACHE', '1') != '0'
+# Coalesce identical in-flight work: duplicate requests wait for the first one's result.
+resume_generation_flight = SingleFlight('resume_generation')
+llm_flight = SingleFlight('llm_calls')
+
+# --- App-process services ---
+# Everything below is only built in the app process; render workers (RENDER_WORKER) keep these as None.
+openai_client = pdf_jobs = render_service = None
+resume_data_cache = last_resume_cache = extracted_text_cache = extraction_cache = None
+rewrite_cache = openai_response_cache = rendered_pdf_cache = None
+if not RENDER_WORKER:
+    try:
+        openai_client = OpenAI(timeout=LLM_CALL_TIMEOUT, max_retries=0)  # create_completion retries within a deadline
+        log.info("✅ OpenAI client initialized successfully.")
+    except Exception as e:
+        log.error(f"FATAL ERROR: Could not initialize OpenAI client. Is OPENAI_API_KEY set in .env? Error: {e}")
+        sys.exit(1)
+
+    # Bounded caches for generated resume data; limits are tunable via env for sizing in production.
+    # With CACHE_BACKEND=sqlite (default) they live in a file shared by every worker on the host.
+    # Entries are filed per user (owner=user_id), and each user is capped so one heavy user only evicts their own.
+    resume_data_cache = make_cache(
+        'resume_data',
+        max_entries=int(os.environ.get('RESUME_CACHE_MAX_ENTRIES', '500')),
+        max_bytes=int(os.environ.get('RESUME_CACHE_MAX_BYTES', str(32 * 1024 * 1024))),
+        ttl=float(os.environ.get('RESUME_CACHE_TTL', str(6 * 3600))),
+        owner_max_entries=int(os.environ.get('RESUME_CACHE_USER_MAX_ENTRIES', '25')),
+    )
+    # per-user last successful resume_data with its cache_key
+    last_resume_cache = make_cache(
+        'last_resume',
+        max_entries=int(os.environ.get('LAST_RESUME_CACHE_MAX_ENTRIES', '1000')),
+        max_bytes=int(os.environ.get('LAST_RESUME_CACHE_MAX_BYTES', str(16 * 1024 * 1024))),
+        ttl=float(os.environ.get('RESUME_CACHE_TTL', str(6 * 3600))),
+    )
+    # Extracted resume text, keyed by a hash of the uploaded bytes (users re-upload the same file many times).
+    # The stage caches below are keyed by content but, like resume_data, filed under the user whose request
+    # filled them: /api/clear-cache drops them too, and each user only evicts their own entries.
+    extracted_text_cache = make_cache(
+        'extracted_text',
+        max_entries=int(os.environ.get('EXTRACT_CACHE_MAX_ENTRIES', '1000')),
+        max_bytes=int(os.environ.get('EXTRACT_CACHE_MAX_BYTES', str(16 * 1024 * 1024))),
+        ttl=float(os.environ.get('EXTRACT_CACHE_TTL', str(24 * 3600))),
+        owner_max_entries=int(os.environ.get('EXTRACT_CACHE_USER_MAX_ENTRIES', '50')),
+    )
+    # The two generation stages are cached separately: extraction by (schema, resume text),
+    # rewriting by (extracted data, JD). A new JD for a known resume then costs one LLM call.
+    extraction_cache = make_cache(
+        'resume_extraction',
+        max_entries=int(os.environ.get('EXTRACTION_CACHE_MAX_ENTRIES', '1000')),
+        max_bytes=int(os.environ.get('EXTRACTION_CACHE_MAX_BYTES', str(32 * 1024 * 1024))),
+        ttl=float(os.environ.get('EXTRACTION_CACHE_TTL', str(24 * 3600))),
+        owner_max_entries=int(os.environ.get('EXTRACTION_CACHE_USER_MAX_ENTRIES', '50')),
+    )
+    rewrite_cache = make_cache(
+        'resume_rewrite',
+        max_entries=int(os.environ.get('REWRITE_CACHE_MAX_ENTRIES', '1000')),
+        max_bytes=int(os.environ.get('REWRITE_CACHE_MAX_BYTES', str(32 * 1024 * 1024))),
+        ttl=float(os.environ.get('RESUME_CACHE_TTL', str(6 * 3600))),
+        owner_max_entries=int(os.environ.get('REWRITE_CACHE_USER_MAX_ENTRIES', '50')),
+    )
+    # Keyed by model + params + messages; stored on disk (OPENAI_CACHE_PATH, default the shared
+    # cache file) so it survives restarts.
+    openai_response_cache = make_cache(
+        'openai_responses',
+        backend='sqlite',
+        path=os.environ.get('OPENAI_CACHE_PATH') or None,
+        max_entries=int(os.environ.get('OPENAI_CACHE_MAX_ENTRIES', '5000')),
+        max_bytes=int(os.environ.get('OPENAI_CACHE_MAX_BYTES', str(64 * 1024 * 1024))),
+        ttl=float(os.environ.get('OPENAI_CACHE_TTL', str(7 * 24 * 3600))),
+        owner_max_entries=int(os.environ.get('OPENAI_CACHE_USER_MAX_ENTRIES', '250')),
+    )
+    # Rendered PDF bytes per (canonical resume data hash, template id); evicted by total size, overall and per user.
+    rendered_pdf_cache = make_cache(
+        'rendered_pdf',
+        max_entries=int(os.environ.get('PDF_CACHE_MAX_ENTRIES', '2000')),
+        max_bytes=int(os.environ.get('PDF_CACHE_MAX_BYTES', str(128 * 1024 * 1024))),
+        ttl=float(os.environ.get('PDF_CACHE_TTL', str(6 * 3600))),
+        owner_max_bytes=int(os.environ.get('PDF_CACHE_USER_MAX_BYTES', str(16 * 1024 * 1024))),
+    )
+    # Async generate-pdf jobs: a small bounded pool per worker, records/results in the shared cache.
+    pdf_jobs = JobStore(
+        'pdf_jobs',
+        max_workers=int(os.environ.get('PDF_JOB_WORKERS', '2')),
+        max_pending=int(os.environ.get('PDF_JOB_MAX_PENDING', '16')),
+        ttl=float(os.environ.get('PDF_JOB_TTL', '3600')),
+    )
+    # PDF rendering runs on a warm pool of worker processes (RENDER_MODE / RENDER_PROCESSES / RENDER_MAX_QUEUE).
+    render_service = RenderService()
+    if os.environ.get('RENDER_WARM', '1') != '0':
+        render_service.warm()
+
+    with app.app_context():
+        db.create_all()
+extraction_stats = {'cpu_seconds_saved': 0.0, 'parses': 0, 'cache_hits': 0, 'truncated': 0}
+extraction_stats_lock = threading.Lock()
+
+# Extraction stops at whichever cap is hit first; a resume never needs more than a few pages.
+EXTRACT_MAX_PAGES = int(os.environ.get('EXTRACT_MAX_PAGES', '20'))
+EXTRACT_MAX_CHARS = int(os.environ.get('EXTRACT_MAX_CHARS', '100000'))
+EXTRACT_TIME_BUDGET = float(os.environ.get('EXTRACT_TIME_BUDGET', '5'))  # seconds per file
+
+def iter_pdf_pages(file_stream):
+    """Yield each page's text; pages are only parsed when the consumer asks for them."""
+    pdf_reader = PyPDF2.PdfReader(file_stream)
+    for page in pdf_reader.pages:
+        yield page.extract_text() or ""
+
+def iter_docx_blocks(file_stream):
+    """Yield the text of each paragraph and table row in document order (table cells joined by ' | ')."""
+    doc = docx.Document(file_stream)
+    for child in doc.element.body.iterchildren():
+        if child.tag == qn('w:p'):
+            yield Paragraph(child, doc).text
+        elif child.tag == qn('w:tbl'):
+            for row in Table(child, doc).rows:
+                cells = []
+                for cell in row.cells:
+                    text = cell.text.strip()
+                    if text and (not cells or cells[-1] != text):  # merged cells repeat their text
+                        cells.append(text)
+                if cells:
+                    yield " | ".join(cells)
+
+def parse_resume_file(file_stream, file_name):
+    """Text of a PDF/DOCX upload, bounded by EXTRACT_MAX_PAGES, EXTRACT_MAX_CHARS and EXTRACT_TIME_BUDGET.
+
+    Returns (text, truncated_by): truncated_by is None, 'pages', 'chars' or 'time'. Pages are
+    pulled one at a time and never kept beyond the capped text, so a huge upload costs no more
+    than its first few pages. (The budget is checked between pages; one slow page can overrun it.)
+    """
     if file_name.endswith('.pdf'):
-        pdf_reader = PyPDF2.PdfReader(file_stream); text = "".join(page.extract_text() or "" for page in pdf_reader.pages)
+        blocks, separator, max_pages = iter_pdf_pages(file_stream), "", EXTRACT_MAX_PAGES
     elif file_name.endswith('.docx'):
-        doc = docx.Document(file_stream); text = "\n".join(para.text for para in doc.paragraphs)
+        blocks, separator, max_pages = iter_docx_blocks(file_stream), "\n", None  # .docx has no fixed pages
     else: raise ValueError("Unsupported file type")
+
+    deadline = time.monotonic() + EXTRACT_TIME_BUDGET
+    parts, chars, truncated_by = [], 0, None
+    for index, block in enumerate(blocks):
+        if max_pages is not None and index >= max_pages:
+            truncated_by = 'pages'; break
+        if index and time.monotonic() > deadline:
+            truncated_by = 'time'; break
+        if parts:
+            chars += len(separator)
+        if chars + len(block) > EXTRACT_MAX_CHARS:
+            parts.append(block[:max(EXTRACT_MAX_CHARS - chars, 0)])
+            truncated_by = 'chars'; break
+        parts.append(block)
+        chars += len(block)
+    blocks.close()
+    return separator.join(parts), truncated_by
+
+def extract_text_from_file(file_stream, file_name, digest=None, owner=None):
+    """Parse a seekable PDF/DOCX stream, memoized by the SHA-256 of its bytes so repeat uploads skip parsing.
+
+    Pass digest when it is already known (upload spools hash while receiving) to skip hashing the stream.
+    A fresh parse is cached under owner (the user id).
+    """
+    if not file_name.endswith(('.pdf', '.docx')): raise ValueError("Unsupported file type")
+    if digest is None:
+        digest = stream_sha256(file_stream)
+    limits = f"{EXTRACT_MAX_PAGES}/{EXTRACT_MAX_CHARS}"
+    text_key = f"{os.path.splitext(file_name)[1]}:{limits}:{digest}"
+    cached = extracted_text_cache.get(text_key)
+    if cached is not None:
+        with extraction_stats_lock:
+            extraction_stats['cache_hits'] += 1
+            extraction_stats['cpu_seconds_saved'] += cached['cpu_seconds']
+        log.info(f"📄 Using CACHED extracted text ({text_key[:16]}...)")
+        return cached['text']
+
+    cpu_start = time.thread_time()
+    with metrics.span('extract'):
+        file_stream.seek(0)
+        text, truncated_by = parse_resume_file(file_stream, file_name)
+    cpu_seconds = time.thread_time() - cpu_start
+    with extraction_stats_lock:
+        extraction_stats['parses'] += 1
+        if truncated_by:
+            extraction_stats['truncated'] += 1
+    if truncated_by:
+        log.warning(f"⚠️ Extraction of {file_name} stopped at the {truncated_by} limit ({len(text)} chars kept)")
+    # A time-budget cut depends on server load, so only deterministic results are cached.
+    if truncated_by != 'time':
+        extracted_text_cache.set(text_key, {'text': text, 'cpu_seconds': cpu_seconds}, owner=owner)
     return text
 
-def calculate_match_score_bert(resume_text, job_description, is_raw_resume=False):
-    print(f"--- Calculating Match Score via OpenAI (Type: {'RAW' if is_raw_resume else 'OPTIMIZED'}) ---")
+# 'llm' asks GPT-4o for the score; 'local' uses the deterministic NumPy engine in scoring.py
+# and falls back to the LLM only if it errors.
+ATS_SCORING_ENGINE = os.environ.get('ATS_SCORING_ENGINE', 'llm')
+BATCH_SCORE_MAX_JDS = int(os.environ.get('BATCH_SCORE_MAX_JDS', '25'))
+BATCH_SCORE_CONCURRENCY = int(os.environ.get('BATCH_SCORE_CONCURRENCY', '4'))
+
+def llm_match_score(resume_text, job_description, owner=None):
+    messages = [
+        {"role": "system", "content": "You are an ATS (Applicant Tracking System) expert. Analyze the Resume vs the Job Description. Give a strict match score from 0 to 100 based on keywords, skills, and experience match. Output ONLY the number (e.g. 75), nothing else."},
+        {"role": "user", "content": f"JOB DESCRIPTION:\n{job_description}\n\nRESUME:\n{resume_text}"}
+    ]
+    
+    response_text = generate_with_openai(messages, owner=owner)
+    if response_text == OPENAI_ERROR_TEXT:
+        raise RuntimeError("OpenAI call failed")  # callers log it and fall back, rather than reading it as a score
+    
+    match = re.search(r'\d+', str(response_text))
+    return float(match.group()) if match else 50.0
+
+def adjust_display_score(score, is_raw_resume):
+    final_score = min(100.0, max(0.0, score))
+    
+    # Apply your logic for Raw vs Optimized display
+    if is_raw_resume:
+        if 66 <= final_score <= 77: 
+            final_score = 65.0
+    else:
+        if 69 < final_score < 78: 
+            final_score = 78.0
+    return final_score
+
+def calculate_match_score_bert(resume_text, job_description, is_raw_resume=False, owner=None):
+    log.debug(f"--- Calculating Match Score via {ATS_SCORING_ENGINE.upper()} engine (Type: {'RAW' if is_raw_resume else 'OPTIMIZED'}) ---")
     if not resume_text or not job_description: return 0.0
+
+    if ATS_SCORING_ENGINE == 'local':
+        try:
+            final_score = adjust_display_score(scoring.score(resume_text, job_description), is_raw_resume)
+            log.debug(f"[MATCH SCORE] Local engine calculated: {final_score}%")
+            return final_score
+        except Exception as e:
+            log.warning(f"⚠️ Local scoring failed ({e}); falling back to OpenAI.")
     
     try:
-        messages = [
-            {"role": "system", "content": "You are an ATS (Applicant Tracking System) expert. Analyze the Resume vs the Job Description. Give a strict match score from 0 to 100 based on keywords, skills, and experience match. Output ONLY the number (e.g. 75), nothing else."},
-            {"role": "user", "content": f"JOB DESCRIPTION:\n{job_description}\n\nRESUME:\n{resume_text}"}
-        ]
-        
-        response_text = generate_with_openai(messages)
-        
-        import re
-        match = re.search(r'\d+', str(response_text))
-        score = float(match.group()) if match else 50.0
-        
-        final_score = min(100.0, max(0.0, score))
-        
-        # Apply your logic for Raw vs Optimized display
-        if is_raw_resume:
-            if 66 <= final_score <= 77: 
-                final_score = 65.0
-        else:
-            if 69 < final_score < 78: 
-                final_score = 78.0
-                
-        print(f"[MATCH SCORE] OpenAI calculated: {final_score}%")
+        final_score = adjust_display_score(llm_match_score(resume_text, job_description, owner), is_raw_resume)
+        log.debug(f"[MATCH SCORE] OpenAI calculated: {final_score}%")
         return final_score
 
     except Exception as e:
-        print(f"❌ Error calculating score with OpenAI: {e}")
+        log.error(f"❌ Error calculating score with OpenAI: {e}")
         return 50.0
 
-def normalize_resume_for_template(template_id, data):
-    """Best-effort adapter so one canonical resume payload can render in all templates."""
-    safe = copy.deepcopy(data) if isinstance(data, dict) else {}
-
-    # Canonical fields from template1
-    name = safe.get('name', '')
-    summary = safe.get('summary') or safe.get('profile') or safe.get('profile_summary') or ''
-    experience = safe.get('experience', []) or safe.get('work_experience', [])
-    education = safe.get('education', [])
-    skills_raw = safe.get('skills', [])
-    contact_raw = safe.get('contact', [])
-    
-    # Flatten skills if it's a dict like {"Technical Skills": [...], "Soft Skills": [...]}
-    def flatten_skills(skills_input):
-        if isinstance(skills_input, dict):
-            flat = []
-            for category, items in skills_input.items():
-                if isinstance(items, list):
-                    flat.extend(items)
-                else:
-                    flat.append(str(items))
-            return flat
-        elif isinstance(skills_input, list):
-            return skills_input
-        else:
-            return [str(skills_input)] if skills_input else []
-    
-    skills_flat = flatten_skills(skills_raw)
-
-    # Helper: map contact list -> dict
-    def contact_list_to_dict(lst, keys):
-        if not isinstance(lst, list):
-            return lst if isinstance(lst, dict) else {}
-        out = {}
-        for idx, key in enumerate(keys):
-            if idx < len(lst):
-                out[key] = lst[idx]
-        return out
-
-    if template_id == 'template2':
-        # Expect: contact dict, skills list, software list[dict], languages list[dict]
-        safe['contact'] = contact_list_to_dict(safe.get('contact', []), ["Address", "Phone", "E-mail", "LinkedIn"])
-        # Use flattened skills
-        safe['skills'] = skills_flat
-        # Coerce lists
-        for key in ['software', 'languages', 'experience', 'education', 'certifications', 'interests']:
-            if not isinstance(safe.get(key), list):
-                if safe.get(key):
-                    safe[key] = [safe[key]]
-                else:
-                    safe[key] = []
-        # Ensure dict items for experience/education
-        def ensure_dict_list(items):
-            out = []
-            for item in items:
-                if isinstance(item, dict):
-                    out.append(item)
-                else:
-                    out.append({'role': str(item), 'duties': []})
-            return out
-        safe['experience'] = ensure_dict_list(safe.get('experience', []))
-        safe['education'] = ensure_dict_list(safe.get('education', []))
-        # Fill summary into first experience/company if needed
-        if summary and not safe['experience']:
-            safe['experience'] = [{'role': '', 'company': '', 'duties': [summary]}]
-
-    elif template_id == 'template3':
-        # Expect: contact dict with Phone, Website, Email
-        safe['contact'] = contact_list_to_dict(safe.get('contact', []), ["Phone", "Website", "Email"])
-        # Normalize work_experience list
-        work = safe.get('work_experience') or safe.get('experience') or []
-        if not isinstance(work, list):
-            work = [work]
-        norm_work = []
-        for item in work:
-            if isinstance(item, dict):
-                # duties can be list or str; keep str
-                duties = item.get('duties')
-                if isinstance(duties, list):
-                    item = {**item, 'duties': "\n".join(duties)}
-                norm_work.append(item)
-            else:
-                norm_work.append({'company': str(item), 'duties': str(item)})
-        safe['work_experience'] = norm_work
-        # Education list
-        edu = safe.get('education', [])
-        if not isinstance(edu, list): edu = [edu]
-        norm_edu = []
-        for item in edu:
-            if isinstance(item, dict):
-                # details might be list -> join
-                det = item.get('details')
-                if isinstance(det, list):
-                    item = {**item, 'details': "\n".join(det)}
-                norm_edu.append(item)
-            else:
-                norm_edu.append({'university': str(item), 'details': str(item)})
-        safe['education'] = norm_edu
-        # Skills/hobbies - use flattened skills
-        safe['skills'] = skills_flat
-        hobbies = safe.get('hobbies', [])
-        if not isinstance(hobbies, list):
-            safe['hobbies'] = [hobbies] if hobbies else []
-        # Profile
-        safe['profile'] = summary
-
-    elif template_id == 'template4':
-        # Expect: contact dict with lower-case keys
-        contact_dict = contact_list_to_dict(safe.get('contact', []), ["Phone", "Email", "Location", "LinkedIn"])
-        # Map to lowercase keys expected by template4
-        safe['contact'] = {
-            'phone': contact_dict.get('Phone', ''),
-            'email': contact_dict.get('Email', ''),
-            'address': contact_dict.get('Location', ''),
-            'website': contact_dict.get('LinkedIn', '')
-        }
-        # work_experience duties list - limit to top 2 experiences for space
-        work = safe.get('work_experience') or safe.get('experience') or []
-        if not isinstance(work, list): work = [work]
-        norm_work = []
-        for item in work[:2]:  # Limit to first 2 experiences to prevent layout overflow
-            if isinstance(item, dict):
-                duties = item.get('duties')
-                if isinstance(duties, str): duties = [duties]
-                if duties is None: duties = []
-                # Limit duties to first 3 for space
-                item = {**item, 'duties': duties[:3]}
-                norm_work.append(item)
-            else:
-                norm_work.append({'company': str(item), 'duties': [str(item)]})
-        safe['work_experience'] = norm_work
-        # education details list - limit to top 2 for space
-        edu = safe.get('education', [])
-        if not isinstance(edu, list): edu = [edu]
-        norm_edu = []
-        for item in edu[:2]:  # Limit to first 2 education entries
-            if isinstance(item, dict):
-                details = item.get('details')
-                if isinstance(details, str): details = [details]
-                if details is None: details = []
-                item = {**item, 'details': details[:2]}  # Limit details
-                norm_edu.append(item)
-            else:
-                norm_edu.append({'degree': str(item), 'details': [str(item)]})
-        safe['education'] = norm_edu
-        # skills list - use flattened skills (limit to first 10 for space)
-        safe['skills'] = skills_flat[:10]
-        # languages list of dicts
-        langs = safe.get('languages', [])
-        if not isinstance(langs, list): langs = [langs]
-        norm_langs = []
-        for l in langs:
-            if isinstance(l, dict):
-                norm_langs.append(l)
-            else:
-                norm_langs.append({'language': str(l), 'level': 'Fluent'})
-        safe['languages'] = norm_langs
-        # profile summary
-        safe['profile_summary'] = summary
+def canonical_data_hash(data):
+    """Stable SHA-256 of a JSON-like payload (key order and whitespace don't matter)."""
+    return hashlib.sha256(json.dumps(data, sort_keys=True, separators=(',', ':'), default=str).encode('utf-8')).hexdigest()
+
+def flight_key(*parts):
+    return hashlib.sha256("\x1f".join(str(p) for p in parts).encode('utf-8')).hexdigest()
+
+def coalesced_score(resume_text, job_description, is_raw_resume=False, owner=None):
+    """calculate_match_score_bert, sharing one LLM call between identical concurrent requests."""
+    key = flight_key('score', is_raw_resume, resume_text, job_description)
+    return llm_flight.do(key, calculate_match_score_bert, resume_text, job_description, is_raw_resume=is_raw_resume, owner=owner)
+
+def coalesced_completion(messages, json_mode=False, owner=None):
+    """generate_with_openai, sharing one LLM call between identical concurrent requests."""
+    key = flight_key('completion', json_mode, json.dumps(messages, sort_keys=True))
+    return llm_flight.do(key, generate_with_openai, messages, json_mode=json_mode, owner=owner)
 
-    return safe
+def timed_call(timings, label, fn, *args, **kwargs):
+    """Call fn and record its wall time (seconds) under timings[label]."""
+    start = time.perf_counter()
+    try:
+        return fn(*args, **kwargs)
+    finally:
+        timings[label] = round(time.perf_counter() - start, 3)
+
+def submit_llm_call(timings, label, fn, *args, **kwargs):
+    """Start an LLM-bound call on the shared pool and return its Future.
+
+    With LLM_CONCURRENT_MODE off the call runs inline, so callers can use the same code path either way.
+    """
+    if LLM_CONCURRENT_MODE:
+        return llm_executor.submit(timed_call, timings, label, fn, *args, **kwargs)
+    future = Future()
+    try:
+        future.set_result(timed_call(timings, label, fn, *args, **kwargs))
+    except Exception as e:
+        future.set_exception(e)
+    return future
+
+def await_llm_call(future, label, default):
+    """Wait for a pooled LLM call, returning default if it exceeds LLM_TOTAL_TIMEOUT."""
+    try:
+        return future.result(timeout=LLM_TOTAL_TIMEOUT)
+    except FutureTimeoutError:
+        log.info(f"⏱️ LLM call '{label}' timed out after {LLM_TOTAL_TIMEOUT}s")
+        return default
+
+# Step 2 mode: 'whole' rewrites the full JSON in one completion; 'sections' rewrites the
+# summary, each experience/project entry and the skills concurrently with small prompts.
+REWRITE_MODE = os.environ.get('REWRITE_MODE', 'whole')
+REWRITE_SECTION_MAX_TOKENS = int(os.environ.get('REWRITE_SECTION_MAX_TOKENS', '1024'))
+REWRITE_SECTION_SYSTEM_MESSAGE = (
+    "You are an expert resume writer. You receive one section of a resume as a JSON object of the form "
+    "{\"value\": ...}. Rewrite its string values to be more professional, impactful and aligned with the job "
+    "description: start duties with action verbs and work in the job's keywords naturally. Do not add, remove or "
+    "rename keys, do not add or remove list items, and do not invent jobs, projects or skills. "
+    "Output ONLY the rewritten JSON object with the same {\"value\": ...} shape."
+)
+# Worth another attempt: 429s, connection errors/timeouts and 5xx (the errors the SDK itself retries).
+RETRYABLE_LLM_ERRORS = (RateLimitError, APIConnectionError, InternalServerError)
 
-def generate_with_openai(messages, json_mode=False):
-    # This function is unchanged and correct
-    print("Sending request to OpenAI API...")
+def llm_retry_delay(error, attempt):
+    """Seconds to wait before the next attempt: the server's Retry-After if it sent one, else jittered backoff."""
+    response = getattr(error, 'response', None)
     try:
-        api_params = {"model": "gpt-4o", "messages": messages, "temperature": 0.3, "max_tokens": 4096}
-        if json_mode:
-            api_params["response_format"] = {"type": "json_object"}
-        completion = openai_client.chat.completions.create(**api_params)
+        return max(0.0, float(response.headers.get('retry-after')))
+    except (AttributeError, TypeError, ValueError):
+        return min(8.0, 0.5 * 2 ** attempt) * random.uniform(0.75, 1.0)
+
+def create_completion(api_params):
+    """openai_client.chat.completions.create with retries, all within LLM_TOTAL_TIMEOUT."""
+    deadline = time.monotonic() + LLM_TOTAL_TIMEOUT
+    attempt = 0
+    while True:
+        remaining = deadline - time.monotonic()
+        try:
+            return openai_client.chat.completions.create(**api_params, timeout=max(1.0, min(LLM_CALL_TIMEOUT, remaining)))
+        except RETRYABLE_LLM_ERRORS as e:
+            delay = llm_retry_delay(e, attempt)
+            if attempt >= LLM_MAX_RETRIES or time.monotonic() + delay + 1.0 > deadline:
+                raise
+            attempt += 1
+            log.warning(f"⚠️ OpenAI call failed ({type(e).__name__}); retry {attempt}/{LLM_MAX_RETRIES} in {delay:.1f}s")
+            time.sleep(delay)
+
+OPENAI_ERROR_JSON = '{"name": "Error", "summary": "Failed to connect to OpenAI API."}'
+OPENAI_ERROR_TEXT = "Error: Failed to connect to OpenAI API."
+
+class ResumeDataError(Exception):
+    """Generation produced no usable resume data."""
+
+def generate_with_openai(messages, json_mode=False, cache=None, max_tokens=4096, owner=None):
+    """One chat completion. cache=True/False opts this call in or out of the persistent
+    response cache; None follows OPENAI_RESPONSE_CACHE. Failed calls are never cached;
+    others are cached under owner (the user id)."""
+    use_cache = OPENAI_RESPONSE_CACHE if cache is None else cache
+    api_params = {"model": "gpt-4o", "messages": messages, "temperature": 0.3, "max_tokens": max_tokens}
+    if json_mode:
+        api_params["response_format"] = {"type": "json_object"}
+    if use_cache:
+        response_key = canonical_data_hash(api_params)
+        cached_response = openai_response_cache.get(response_key)
+        if cached_response is not None:
+            log.info("✅ Using CACHED OpenAI response")
+            metrics.LLM_CALLS.inc(model=api_params['model'], outcome='cached')
+            return cached_response
+    log.debug("Sending request to OpenAI API...")
+    try:
+        with metrics.span('llm_call'):
+            completion = create_completion(api_params)
+        metrics.record_usage(api_params['model'], completion.usage)
         if not completion.choices:
             raise RuntimeError("No choices returned from OpenAI")
         response_text = completion.choices[0].message.content or ""
-        print("--- OpenAI Raw Response ---"); print(response_text); print("---------------------------")
+        log.debug("OpenAI response: %d chars, usage %s", len(response_text), completion.usage)
+        metrics.LLM_CALLS.inc(model=api_params['model'], outcome='ok')
+        if use_cache and response_text:
+            openai_response_cache.set(response_key, response_text, owner=owner)
         return response_text
     except Exception as e:
-        print(f"FATAL ERROR: OpenAI API call failed. Error: {e}")
-        return '{"name": "Error", "summary": "Failed to connect to OpenAI API."}' if json_mode else "Error: Failed to connect to OpenAI API."
+        log.error(f"FATAL ERROR: OpenAI API call failed. Error: {e}")
+        metrics.LLM_CALLS.inc(model=api_params['model'], outcome='error')
+        return OPENAI_ERROR_JSON if json_mode else OPENAI_ERROR_TEXT
+
+def split_resume_sections(data):
+    """Independent rewrite units of a canonical (template1) resume as (path, value) pairs."""
+    sections = []
+    if isinstance(data.get('summary'), str) and data['summary'].strip():
+        sections.append((('summary',), data['summary']))
+    for key in ('experience', 'projects'):
+        items = data.get(key)
+        if isinstance(items, list):
+            for index, item in enumerate(items):
+                if isinstance(item, dict):
+                    sections.append(((key, index), item))
+    if data.get('skills'):
+        sections.append((('skills',), data['skills']))
+    return sections
+
+def merge_rewritten_section(original, rewritten):
+    """Keep the rewrite only if it has the original's shape; dicts keep exactly the original keys."""
+    if isinstance(original, dict) and isinstance(rewritten, dict):
+        return {key: merge_rewritten_section(value, rewritten.get(key, value)) for key, value in original.items()}
+    if isinstance(original, list) and isinstance(rewritten, list) and len(rewritten) == len(original):
+        return [merge_rewritten_section(o, r) for o, r in zip(original, rewritten)]
+    if isinstance(original, str) and isinstance(rewritten, str) and rewritten.strip():
+        return rewritten
+    return original
+
+def rewrite_section(value, job_description):
+    messages = [
+        {"role": "system", "content": REWRITE_SECTION_SYSTEM_MESSAGE},
+        {"role": "user", "content": f"**TARGET JOB DESCRIPTION:**\n{job_description}\n\n**SECTION TO REWRITE:**\n```json\n{json.dumps({'value': value}, indent=2)}\n```"},
+    ]
+    response = generate_with_openai(messages, json_mode=True, cache=False, max_tokens=REWRITE_SECTION_MAX_TOKENS)
+    if response == OPENAI_ERROR_JSON:
+        raise RuntimeError("OpenAI call failed")
+    return json.loads(repair_json(response)).get('value')
+
+def rewrite_sections_concurrently(truthful_data, job_description):
+    """Step 2 in 'sections' mode: rewrite each section with its own small prompt, all at once.
+
+    Wall time follows the longest section rather than the whole document. A section whose
+    call fails, times out or changes shape keeps its extracted (truthful) text.
+    Returns (final_data, number_of_failed_sections).
+    """
+    timings = {}
+    failed = 0
+    sections = split_resume_sections(truthful_data)
+    futures = [(path, value, submit_llm_call(timings, ".".join(map(str, path)), rewrite_section, value, job_description)) for path, value in sections]
+    final_data = copy.deepcopy(truthful_data)
+    for path, value, future in futures:
+        try:
+            rewritten = await_llm_call(future, ".".join(map(str, path)), None)
+        except Exception as e:
+            log.warning(f"⚠️ Section {path} rewrite failed ({e}); keeping extracted text.")
+            rewritten = None
+        if rewritten is None:
+            failed += 1
+            rewritten = value
+        target = final_data
+        for part in path[:-1]:
+            target = target[part]
+        target[path[-1]] = merge_rewritten_section(value, rewritten)
+    log.info(f"⏱️ Section rewrite timings (s): {timings}")
+    return final_data, failed
 
 # ✅ THIS IS THE NEW, ROBUST, 2-STEP FUNCTION
-def generate_full_resume_text(resume_text, job_description, ai_suggestions, template_id):
-    print("--- Starting 2-Step Resume Generation Process ---")
+def generate_full_resume_text(resume_text, job_description, ai_suggestions, template_id, owner=None):
+    """Returns (resume_data, degraded). degraded is True when step 2 fell back to extracted
+    text for some or all of the resume; such a result is served but never cached."""
+    log.debug("--- Starting 2-Step Resume Generation Process ---")
     
     # --- STEP 1: TRUTHFUL DATA EXTRACTION ---
-    print("\n[STEP 1/2] Extracting truthful data from original resume...")
+    log.info("[STEP 1/2] Extracting truthful data from original resume...")
     try:
-        json_structure = importlib.import_module(f"templates.{template_id}").get_json_prompt()
+        json_structure = get_template(template_id).get_json_prompt()
     except:
-        print(f"⚠️ WARNING: Could not load prompt from {template_id}.py."); json_structure = "{}"
+        log.warning(f"⚠️ WARNING: Could not load prompt from {template_id}.py."); json_structure = "{}"
     
     extraction_system_message = "You are a data extraction bot. Your only task is to read the user's resume text and populate the JSON structure with the information found. Do not rewrite, invent, or change any information. Extract the data exactly as it appears."
     extraction_user_prompt = f"Extract all information from the 'Original Resume Text' below and place it into the following JSON structure. Do not add any information that is not in the original text. \n\nJSON STRUCTURE:\n```json\n{json_structure}\n```\n\nOriginal Resume Text:\n{resume_text}"
     extraction_messages = [{"role": "system", "content": extraction_system_message}, {"role": "user", "content": extraction_user_prompt}]
-    
-    truthful_json_str = generate_with_openai(extraction_messages, json_mode=True)
-    try:
-        truthful_data = json.loads(repair_json(truthful_json_str))
-        print("✅ Step 1 Successful: Truthful data extracted.")
-    except Exception as e:
-        print(f"FATAL ERROR in Step 1 (Extraction): {e}")
-        return {"name": "Error", "summary": f"Failed to extract initial data. Raw response: {truthful_json_str}"}
+
+    # Step 1 depends only on the resume text and the schema/prompt, never on the JD,
+    # so re-targeting the same resume to a new job reuses it.
+    schema_version = flight_key(json_structure, extraction_system_message)[:16]
+    extraction_key = f"{schema_version}:{hashlib.sha256(resume_text.encode('utf-8')).hexdigest()}"
+    truthful_data = extraction_cache.get(extraction_key)
+    if truthful_data is not None:
+        log.info("✅ Step 1 Successful: Using CACHED truthful data.")
+    else:
+        truthful_json_str = generate_with_openai(extraction_messages, json_mode=True, cache=False)  # has its own stage cache
+        if truthful_json_str == OPENAI_ERROR_JSON:
+            raise ResumeDataError('Failed to extract resume data: the OpenAI API call failed')
+        try:
+            truthful_data = json.loads(repair_json(truthful_json_str))
+        except Exception as e:
+            log.error(f"FATAL ERROR in Step 1 (Extraction): {e}. Raw response: {truthful_json_str}")
+            raise ResumeDataError('Failed to extract resume data')
+        if not isinstance(truthful_data, dict):
+            log.error(f"FATAL ERROR in Step 1 (Extraction): expected a JSON object. Raw response: {truthful_json_str}")
+            raise ResumeDataError('Failed to extract resume data')
+        log.info("✅ Step 1 Successful: Truthful data extracted.")
+        extraction_cache.set(extraction_key, truthful_data, owner=owner)
 
     # --- STEP 2: FOCUSED REWRITING AND OPTIMIZATION ---
-    print("\n[STEP 2/2] Rewriting and optimizing the extracted data...")
+    log.info("[STEP 2/2] Rewriting and optimizing the extracted data...")
     rewriting_system_message = "You are an expert resume writer. Your task is to take a JSON object and rewrite its string fields to be more professional, action-oriented, and tailored to the provided job description. You must not add new entries or change the structure of the JSON."
     rewriting_user_prompt = f"""
     Please rewrite the string values (like 'summary', 'duties', 'role') in the following JSON object to be more professional and better aligned with the 'Target Job Description'.
@@ -350,170 +682,702 @@ def generate_full_resume_text(resume_text, job_description, ai_suggestions, temp
     ```
     """
     rewriting_messages = [{"role": "system", "content": rewriting_system_message}, {"role": "user", "content": rewriting_user_prompt}]
+
+    rewrite_key = flight_key(canonical_data_hash(truthful_data), job_description, rewriting_system_message, REWRITE_MODE)
+    final_data = rewrite_cache.get(rewrite_key)
+    if final_data is not None:
+        log.info("✅ Step 2 Successful: Using CACHED rewritten data.")
+        return final_data, False
+
+    if REWRITE_MODE == 'sections':
+        final_data, failed_sections = rewrite_sections_concurrently(truthful_data, job_description)
+        if failed_sections and failed_sections == len(split_resume_sections(truthful_data)):
+            raise ResumeDataError('Failed to rewrite resume data: every section rewrite failed')
+        if failed_sections:
+            log.warning(f"⚠️ Step 2 partially failed: {failed_sections} section(s) kept their extracted text.")
+            return final_data, True
+        log.info("✅ Step 2 Successful: Resume sections rewritten and optimized.")
+        rewrite_cache.set(rewrite_key, final_data, owner=owner)
+        return final_data, False
     
-    final_json_str = generate_with_openai(rewriting_messages, json_mode=True)
+    final_json_str = generate_with_openai(rewriting_messages, json_mode=True, cache=False)  # has its own stage cache
+    if final_json_str == OPENAI_ERROR_JSON:
+        raise ResumeDataError('Failed to rewrite resume data: the OpenAI API call failed')
     try:
         final_data = json.loads(repair_json(final_json_str))
-        print("✅ Step 2 Successful: Resume data rewritten and optimized.")
-        return final_data
+        log.info("✅ Step 2 Successful: Resume data rewritten and optimized.")
+        if isinstance(final_data, dict):
+            rewrite_cache.set(rewrite_key, final_data, owner=owner)
+        return final_data, False
     except Exception as e:
-        print(f"FATAL ERROR in Step 2 (Rewriting): {e}")
-        print("⚠️ Falling back to truthfully extracted data without rewrite.")
-        return truthful_data # As a fallback, return the original, non-rewritten data.
+        log.error(f"FATAL ERROR in Step 2 (Rewriting): {e}")
+        log.warning("⚠️ Falling back to truthfully extracted data without rewrite.")
+        return truthful_data, True # As a fallback, return the original, non-rewritten data.
 
-# ✅ THIS ROUTE IS NOW SIMPLER
-@app.route('/api/optimize', methods=['POST', 'OPTIONS'])
-@login_required
-def optimize_resume_route():
-    if request.method == 'OPTIONS': return jsonify(ok=True)
+def stream_with_openai(messages):
+    """Yield the response text of a streaming chat completion chunk by chunk."""
+    log.debug("Streaming request from OpenAI API...")
+    api_params = {"model": "gpt-4o", "messages": messages, "temperature": 0.3, "max_tokens": 4096,
+                  "stream": True, "stream_options": {"include_usage": True}}
     try:
-        file, job_description = request.files.get('resumeFile'), request.form.get('jobDescription')
-        if not file or not job_description:
-            return jsonify({'error': 'Missing data'}), 400
+        with metrics.span('llm_stream'):
+            for chunk in create_completion(api_params):
+                if chunk.usage:
+                    metrics.record_usage(api_params['model'], chunk.usage)
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+    except Exception:
+        metrics.LLM_CALLS.inc(model=api_params['model'], outcome='error')
+        raise
+    metrics.LLM_CALLS.inc(model=api_params['model'], outcome='ok')
 
-        # Always rewind the stream before reading
-        try:
-            file.stream.seek(0)
-        except Exception:
-            pass
+def build_suggestion_messages(resume_text, job_description):
+    return [
+        {"role": "system", "content": "You are an expert AI career coach."},
+        {"role": "user", "content": f"Analyze this resume based on this job description. Provide 3-5 short, actionable bullet-point suggestions for improvement. Output ONLY the bullet points.\n\nRESUME:\n{resume_text}\n\nJOB:\n{job_description}"}
+    ]
+
+# Where a request's resume comes from: digest keys the caches, load_text() is only called on a miss.
+ResumeSource = namedtuple('ResumeSource', ['digest', 'load_text'])
+
+def has_resume():
+    return bool(request.files.get('resumeFile') or request.form.get('resumeId'))
+
+def read_resume_source(detach=False):
+    """The request's resume: a stored upload ('resumeId') or the 'resumeFile' upload.
 
+    Returns (ResumeSource, None) or (None, error_response). The upload's spool is closed
+    when the request ends, so detach=True copies it into memory for work that outlives
+    the request (background jobs).
+    """
+    resume_id = request.form.get('resumeId')
+    if resume_id:
+        upload = db.session.get(ResumeUpload, resume_id)
+        if upload is None or upload.user_id != current_user.id:
+            return None, (jsonify({'error': 'Unknown resumeId, upload the resume again'}), 404)
+        text = upload.text
+        return ResumeSource(upload.file_sha256, lambda: text), None
+
+    file = request.files.get('resumeFile')
+    if not file:
+        return None, (jsonify({'error': 'Missing data'}), 400)
+    file_name, digest = file.filename, stream_sha256(file.stream)
+    stream = BytesIO(file.stream.read()) if detach else file.stream
+    owner = current_user.id
+    return ResumeSource(digest, lambda: extract_text_from_file(stream, file_name, digest, owner)), None
+
+def read_resume_upload():
+    """Resume text for 'resumeId' or the 'resumeFile' upload; returns (resume_text, None) or (None, error_response)."""
+    source, error_response = read_resume_source()
+    if error_response:
+        return None, error_response
+    try:
+        return source.load_text(), None
+    except Exception as parse_err:
+        log.exception(f"❌ Failed to parse resume file: {parse_err}")
+        return None, (jsonify({'error': f'Could not read resume file: {parse_err}'}), 400)
+
+def read_optimize_request():
+    """Return (resume_text, job_description, None) from the multipart request, or (None, None, error_response)."""
+    job_description = request.form.get('jobDescription')
+    if not has_resume() or not job_description:
+        return None, None, (jsonify({'error': 'Missing data'}), 400)
+    resume_text, error_response = read_resume_upload()
+    return resume_text, job_description, error_response
+
+def sse_event(event, payload):
+    return f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+
+# ✅ THIS ROUTE IS NOW SIMPLER
+@app.route('/api/resumes', methods=['POST', 'OPTIONS'])
+@login_required
+def upload_resume_route():
+    """Store the 'resumeFile' upload's text once and return its resumeId.
+
+    /api/optimize, /api/score-batch and the /api/generate-pdf endpoints accept that
+    resumeId in place of resumeFile, so switching templates doesn't re-send the file.
+    Uploading the same file again returns the same id.
+    """
+    if request.method == 'OPTIONS': return jsonify(ok=True)
+    file = request.files.get('resumeFile')
+    if not file:
+        return jsonify({'error': 'Missing data'}), 400
+    file_sha256 = stream_sha256(file.stream)
+    upload = ResumeUpload.query.filter_by(user_id=current_user.id, file_sha256=file_sha256).first()
+    if upload is None:
         try:
-            resume_text = extract_text_from_file(file.stream, file.filename)
+            text = extract_text_from_file(file.stream, file.filename, file_sha256, current_user.id)
         except Exception as parse_err:
-            print(f"❌ Failed to parse resume file: {parse_err}")
-            traceback.print_exc()
+            log.exception(f"❌ Failed to parse resume file: {parse_err}")
             return jsonify({'error': f'Could not read resume file: {parse_err}'}), 400
+        upload = ResumeUpload(id=uuid.uuid4().hex, user_id=current_user.id, file_name=file.filename[:255],
+                              file_sha256=file_sha256, text=text, created_at=utcnow())
+        db.session.add(upload)
+        try:
+            db.session.commit()
+        except IntegrityError:
+            db.session.rollback()  # the same file was uploaded concurrently; use that row
+            upload = ResumeUpload.query.filter_by(user_id=current_user.id, file_sha256=file_sha256).first()
+        log.info(f"📥 Stored resume upload {upload.id[:8]} ({len(upload.text)} chars) for user {current_user.id}")
+    return jsonify({'resumeId': upload.id, 'fileName': upload.file_name}), 200
+
+@app.route('/api/optimize', methods=['POST', 'OPTIONS'])
+@login_required
+def optimize_resume_route():
+    if request.method == 'OPTIONS': return jsonify(ok=True)
+    try:
+        resume_text, job_description, error_response = read_optimize_request()
+        if error_response: return error_response
 
         # Ensure models are loaded
         ensure_models_ready()
-        score_before = calculate_match_score_bert(resume_text, job_description, is_raw_resume=True)
-        print(f"📊 Unoptimized Resume Score: {score_before}%")
-        
-        suggestion_messages = [
-            {"role": "system", "content": "You are an expert AI career coach."},
-            {"role": "user", "content": f"Analyze this resume based on this job description. Provide 3-5 short, actionable bullet-point suggestions for improvement. Output ONLY the bullet points.\n\nRESUME:\n{resume_text}\n\nJOB:\n{job_description}"}
-        ]
-        ai_suggestions = generate_with_openai(suggestion_messages)
+        timings = {}
+        request_start = time.perf_counter()
+
+        suggestion_messages = build_suggestion_messages(resume_text, job_description)
+        # The raw score and the suggestions are independent, so they run side by side.
+        # Only the optimized score has to wait, because it scores the suggestions.
+        score_before_future = submit_llm_call(timings, 'score_before', coalesced_score, resume_text, job_description, is_raw_resume=True, owner=current_user.id)
+        suggestions_future = submit_llm_call(timings, 'suggestions', coalesced_completion, suggestion_messages, owner=current_user.id)
+
+        ai_suggestions = await_llm_call(suggestions_future, 'suggestions', None)
         if (not ai_suggestions) or ai_suggestions.startswith("Error"):
-            print(f"❌ AI suggestion generation failed. Response: {ai_suggestions}")
+            log.error(f"❌ AI suggestion generation failed. Response: {ai_suggestions}")
             return jsonify({'error': 'AI suggestion generation failed'}), 502
         
         # We now pass the original text and new suggestions to the next step.
         # The score calculation is now a simple preview.
         preview_text = resume_text + "\n\n" + ai_suggestions
-        score_after = calculate_match_score_bert(preview_text, job_description, is_raw_resume=False)
-        print(f"🤖 Preview Optimized Score: {score_after}%")
+        score_after_future = submit_llm_call(timings, 'score_after', coalesced_score, preview_text, job_description, is_raw_resume=False, owner=current_user.id)
+
+        score_before = await_llm_call(score_before_future, 'score_before', 50.0)
+        log.info(f"📊 Unoptimized Resume Score: {score_before}%")
+        score_after = await_llm_call(score_after_future, 'score_after', 50.0)
+        log.info(f"🤖 Preview Optimized Score: {score_after}%")
+
+        timings['total'] = round(time.perf_counter() - request_start, 3)
+        log.info(f"⏱️ /api/optimize timings (s): {timings}")
         
         return jsonify({
             'match_score': f"{round(score_before, 2)}%",
             'optimized_resume': ai_suggestions.strip(),
             'optimized_resume_full': resume_text, # Send original text
-            'optimized_score': f"{round(score_after, 2)}%"
+            'optimized_score': f"{round(score_after, 2)}%",
+            'timings': timings
         })
     except Exception as e:
-        print(f"❌ FATAL ERROR in /api/optimize: {e}")
-        traceback.print_exc()
+        log.exception(f"❌ FATAL ERROR in /api/optimize: {e}")
         return jsonify({'error': f'Server error: {e}'}), 500
 
+@app.route('/api/optimize/stream', methods=['POST', 'OPTIONS'])
+@login_required
+def optimize_resume_stream_route():
+    """Server-sent-events variant of /api/optimize.
+
+    Events, in order: 'raw_score' (as soon as it is ready, possibly between suggestion
+    chunks), 'suggestion' ({"delta": text}) per streamed token batch, 'optimized_score',
+    then 'done' carrying the same payload /api/optimize returns. Failures send 'error'.
+    """
+    if request.method == 'OPTIONS': return jsonify(ok=True)
+    resume_text, job_description, error_response = read_optimize_request()
+    if error_response: return error_response
+    ensure_models_ready()
+    user_id = current_user.id
+
+    def generate():
+        timings = {}
+        request_start = time.perf_counter()
+        score_before_future = submit_llm_call(timings, 'score_before', coalesced_score, resume_text, job_description, is_raw_resume=True, owner=user_id)
+        score_before = None
+        parts = []
+        try:
+            suggestions_start = time.perf_counter()
+            for delta in stream_with_openai(build_suggestion_messages(resume_text, job_description)):
+                if 'suggestions_first_token' not in timings:
+                    timings['suggestions_first_token'] = round(time.perf_counter() - suggestions_start, 3)
+                parts.append(delta)
+                yield sse_event('suggestion', {'delta': delta})
+                if score_before is None and score_before_future.done():
+                    score_before = score_before_future.result()
+                    yield sse_event('raw_score', {'match_score': f"{round(score_before, 2)}%"})
+            timings['suggestions'] = round(time.perf_counter() - suggestions_start, 3)
+        except Exception as e:
+            log.error(f"❌ AI suggestion stream failed: {e}")
+            yield sse_event('error', {'error': 'AI suggestion generation failed'})
+            return
+        ai_suggestions = "".join(parts)
+        if not ai_suggestions.strip():
+            yield sse_event('error', {'error': 'AI suggestion generation failed'})
+            return
+
+        preview_text = resume_text + "\n\n" + ai_suggestions
+        score_after_future = submit_llm_call(timings, 'score_after', coalesced_score, preview_text, job_description, is_raw_resume=False, owner=user_id)
+        if score_before is None:
+            score_before = await_llm_call(score_before_future, 'score_before', 50.0)
+            yield sse_event('raw_score', {'match_score': f"{round(score_before, 2)}%"})
+        score_after = await_llm_call(score_after_future, 'score_after', 50.0)
+        yield sse_event('optimized_score', {'optimized_score': f"{round(score_after, 2)}%"})
+
+        timings['total'] = round(time.perf_counter() - request_start, 3)
+        log.info(f"⏱️ /api/optimize/stream timings (s): {timings}")
+        yield sse_event('done', {
+            'match_score': f"{round(score_before, 2)}%",
+            'optimized_resume': ai_suggestions.strip(),
+            'optimized_resume_full': resume_text,
+            'optimized_score': f"{round(score_after, 2)}%",
+            'timings': timings
+        })
+
+    return Response(stream_with_context(generate()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+def batch_match_scores(resume_text, job_descriptions, owner=None):
+    """Raw 0-100 match scores of one resume against many JDs, in input order.
+
+    The local engine scores every pair in one vectorized pass; the LLM engine
+    runs at most BATCH_SCORE_CONCURRENCY calls at a time on the shared pool.
+    """
+    if ATS_SCORING_ENGINE == 'local':
+        try:
+            return [float(v) for v in scoring.score_many(resume_text, job_descriptions)]
+        except Exception as e:
+            log.warning(f"⚠️ Local batch scoring failed ({e}); falling back to OpenAI.")
+
+    slots = threading.BoundedSemaphore(BATCH_SCORE_CONCURRENCY)
+    def score_one(job_description):
+        try:
+            key = flight_key('batch_score', resume_text, job_description)
+            return min(100.0, max(0.0, llm_flight.do(key, llm_match_score, resume_text, job_description, owner)))
+        finally:
+            slots.release()
+
+    futures = []
+    for job_description in job_descriptions:
+        slots.acquire()
+        futures.append(llm_executor.submit(score_one, job_description))
+    scores = []
+    for future in futures:
+        try:
+            scores.append(future.result(timeout=LLM_TOTAL_TIMEOUT))
+        except Exception as e:
+            log.error(f"❌ Batch score failed: {e}")
+            scores.append(50.0)
+    return scores
+
+@app.route('/api/score-batch', methods=['POST', 'OPTIONS'])
+@login_required
+def score_batch_route():
+    """Score one uploaded resume against many job descriptions and rank them.
+
+    Send the JDs as repeated 'jobDescriptions' form fields (plain text) or as one
+    JSON-encoded list in 'jobDescriptionsJson'. Every JD must be non-empty text;
+    each result's 'index' is its position in the input. Results are ranked by the
+    raw 'score'; 'match_score' is the display value /api/optimize shows for the same JD.
+    """
+    if request.method == 'OPTIONS': return jsonify(ok=True)
+    try:
+        job_descriptions = request.form.getlist('jobDescriptions')
+        if 'jobDescriptionsJson' in request.form:
+            try:
+                job_descriptions = json.loads(request.form['jobDescriptionsJson'])
+            except ValueError:
+                return jsonify({'error': 'jobDescriptionsJson is not valid JSON'}), 400
+            if not isinstance(job_descriptions, list):
+                return jsonify({'error': 'jobDescriptionsJson must be a JSON list'}), 400
+        if not has_resume() or not job_descriptions:
+            return jsonify({'error': 'Missing data'}), 400
+        invalid = [i for i, jd in enumerate(job_descriptions) if not isinstance(jd, str) or not jd.strip()]
+        if invalid:
+            return jsonify({'error': f"Job descriptions must be non-empty text (invalid at index {', '.join(map(str, invalid))})"}), 400
+        if len(job_descriptions) > BATCH_SCORE_MAX_JDS:
+            return jsonify({'error': f'At most {BATCH_SCORE_MAX_JDS} job descriptions per request'}), 400
+
+        request_start = time.perf_counter()
+        resume_text, error_response = read_resume_upload()
+        if error_response: return error_response
+        extracted_at = time.perf_counter()
+
+        scores = batch_match_scores(resume_text, job_descriptions, owner=current_user.id)
+        ranked = sorted(range(len(job_descriptions)), key=lambda i: scores[i], reverse=True)
+        results = [{
+            'rank': rank,
+            'index': i,
+            'match_score': f"{round(adjust_display_score(scores[i], is_raw_resume=True), 2)}%",
+            'score': round(scores[i], 2),
+            'job_description_preview': job_descriptions[i].strip()[:120],
+        } for rank, i in enumerate(ranked, start=1)]
+        timings = {
+            'extract': round(extracted_at - request_start, 3),
+            'score': round(time.perf_counter() - extracted_at, 3),
+            'total': round(time.perf_counter() - request_start, 3),
+        }
+        log.info(f"📊 Batch-scored {len(job_descriptions)} JDs with {ATS_SCORING_ENGINE} engine in {timings['total']}s")
+        return jsonify({'engine': ATS_SCORING_ENGINE, 'results': results, 'timings': timings})
+    except Exception as e:
+        log.exception(f"❌ FATAL ERROR in /api/score-batch: {e}")
+        return jsonify({'error': f'Server error: {e}'}), 500
+
+def compute_cache_key(user_id, file_digest, job_description, ai_suggestions):
+    """Stable cache key for generated resume data (user + file SHA-256 + jobDescription + aiSuggestions)."""
+    cache_hasher = hashlib.sha256()
+    cache_hasher.update(str(user_id).encode())
+    cache_hasher.update(file_digest.encode())
+    cache_hasher.update(job_description.encode())
+    cache_hasher.update(ai_suggestions.encode())
+    return cache_hasher.hexdigest()
+
+def utcnow():
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+def count_resume_record(field, amount=1):
+    with resume_record_stats_lock:
+        resume_record_stats[field] += amount
+
+def load_resume_record(cache_key):
+    """Resume data persisted under cache_key, or None. Database errors count as a miss."""
+    if not RESUME_RECORDS:
+        return None
+    try:
+        with app.app_context():
+            record = ResumeRecord.query.filter_by(cache_key=cache_key).first()
+            if record is None:
+                count_resume_record('misses')
+                return None
+            resume_data = json.loads(zlib.decompress(record.payload))
+            now = utcnow()
+            if now - record.last_accessed_at > RESUME_RECORD_TOUCH_INTERVAL:
+                record.last_accessed_at = now
+                db.session.commit()
+        count_resume_record('hits')
+        return resume_data
+    except Exception as e:
+        log.warning(f"⚠️ Could not read stored resume data: {e}")
+        count_resume_record('errors')
+        return None
+
+def save_resume_record(user_id, cache_key, resume_data):
+    """Persist resume data under cache_key (last writer wins); failures are logged, never raised."""
+    if not RESUME_RECORDS:
+        return
+    payload = zlib.compress(json.dumps(resume_data, separators=(',', ':')).encode('utf-8'))
+    try:
+        with app.app_context():
+            now = utcnow()
+            record = ResumeRecord.query.filter_by(cache_key=cache_key).first()
+            if record is None:
+                db.session.add(ResumeRecord(cache_key=cache_key, user_id=user_id, payload=payload, created_at=now, last_accessed_at=now))
+            else:
+                record.payload, record.last_accessed_at = payload, now
+            try:
+                db.session.commit()
+            except IntegrityError:
+                db.session.rollback()  # another worker stored the same key first; its data is equivalent
+        count_resume_record('writes')
+    except Exception as e:
+        log.warning(f"⚠️ Could not store resume data: {e}")
+        count_resume_record('errors')
+    maybe_prune_resume_records()
+
+def prune_resume_records(max_age=None):
+    """Delete records not read for max_age (default RESUME_RECORD_MAX_AGE) and expired uploads; returns how many went."""
+    now = utcnow()
+    cutoff = now - (max_age or RESUME_RECORD_MAX_AGE)
+    with app.app_context():
+        deleted = ResumeRecord.query.filter(ResumeRecord.last_accessed_at < cutoff).delete(synchronize_session=False)
+        deleted += ResumeUpload.query.filter(ResumeUpload.created_at < now - RESUME_UPLOAD_MAX_AGE).delete(synchronize_session=False)
+        db.session.commit()
+    count_resume_record('pruned', deleted)
+    if deleted:
+        log.info(f"🧹 Pruned {deleted} stored resume(s) not used since {cutoff:%Y-%m-%d}")
+    return deleted
+
+def maybe_prune_resume_records():
+    now = time.monotonic()
+    with resume_record_stats_lock:
+        if now - last_record_prune[0] < RESUME_RECORD_PRUNE_INTERVAL:
+            return
+        last_record_prune[0] = now
+    try:
+        prune_resume_records()
+    except Exception as e:
+        log.warning(f"⚠️ Could not prune stored resume data: {e}")
+
+def is_valid_resume(resume_data):
+    try:
+        Resume.from_data(resume_data)
+        return True
+    except InvalidResumeError:
+        return False
+
+def get_or_generate_resume_data(user_id, cache_key, load_resume_text, job_description, ai_suggestions):
+    """Canonical (template1-schema) resume data from the caches, generating it on a miss."""
+    # Check if we have cached resume data for this user and file
+    resume_data = resume_data_cache.get(cache_key)
+    if resume_data is not None:
+        log.info(f"✅ Using CACHED resume data (cache key: {cache_key[:12]})")
+        return resume_data
+    # Fallback: reuse last resume for this user if same cache_key matches
+    user_last = last_resume_cache.get(user_id)
+    if user_last and user_last.get('cache_key') == cache_key:
+        log.info(f"♻️ Using LAST resume cache for user {user_id}")
+        return user_last.get('data', {})
+    # Then the database, which outlives both caches (rows stored before validation existed may be error stubs)
+    resume_data = load_resume_record(cache_key)
+    if resume_data is not None and not is_valid_resume(resume_data):
+        log.warning(f"⚠️ Ignoring invalid stored resume data (cache key: {cache_key[:12]})")
+        resume_data = None
+    if resume_data is not None:
+        log.info(f"✅ Using STORED resume data (cache key: {cache_key[:12]})")
+        resume_data_cache.set(cache_key, resume_data, owner=user_id)
+        last_resume_cache.set(user_id, {'cache_key': cache_key, 'data': resume_data}, owner=user_id)
+        return resume_data
+
+    # Generate new resume data only if not cached
+    original_resume_text = load_resume_text()
+    log.info(f"📄 Generating NEW resume data using canonical schema: template1")
+    resume_data, degraded = generate_full_resume_text(original_resume_text, job_description, ai_suggestions, 'template1', owner=user_id)
+
+    # Validate once here, before any cache or database write; everything downstream trusts the canonical shape
+    try:
+        Resume.from_data(resume_data)
+    except InvalidResumeError as e:
+        log.error(f"❌ ERROR: Invalid resume data generated ({e}): {resume_data}")
+        raise ResumeDataError('Failed to generate valid resume data')
+
+    # A partly rewritten resume is served once but not kept, so the next request retries the rewrite
+    if degraded:
+        log.warning(f"⚠️ Not caching degraded resume data (cache key: {cache_key[:12]})")
+        return resume_data
+
+    # Cache the generated data (canonical)
+    resume_data_cache.set(cache_key, resume_data, owner=user_id)
+    last_resume_cache.set(user_id, {'cache_key': cache_key, 'data': resume_data}, owner=user_id)
+    save_resume_record(user_id, cache_key, resume_data)
+    log.info(f"💾 Cached resume data for future use (cache key: {cache_key[:20]}...)")
+    return resume_data
+
+def render_resume_pdf(template, resume_data, wait_for_slot=False, owner=None):
+    """PDF bytes for resume_data in the given template, served from rendered_pdf_cache when possible.
+
+    Raises RenderQueueFullError when the render queue is full, unless wait_for_slot is set.
+    A freshly rendered PDF is cached under owner (the user id).
+    """
+    data_hash = canonical_data_hash(resume_data)
+    pdf_key = f"{template.template_id}:{data_hash}"
+    cached_pdf = rendered_pdf_cache.get(pdf_key)
+    if cached_pdf is not None:
+        log.info(f"✅ Using CACHED PDF for template: {template.template_id}")
+        return cached_pdf
+
+    log.info(f"📋 Building PDF with template: {template.template_id}")
+    pdf_bytes = render_service.render(template.template_id, resume_data, block=wait_for_slot, data_hash=data_hash)
+    rendered_pdf_cache.set(pdf_key, pdf_bytes, owner=owner)
+    log.info(f"✅ PDF generated successfully for {template.template_id}")
+    return pdf_bytes
+
+def read_generate_pdf_request(require_template=True, detach=False):
+    """Validate the generate-pdf form (resumeFile or resumeId); returns (form_data, ResumeSource, None) or an error response last."""
+    data = request.form.to_dict()
+    required = ['jobDescription', 'aiSuggestions'] + (['templateId'] if require_template else [])
+    if not has_resume() or not all(k in data for k in required):
+        return None, None, (jsonify({'error': 'Missing data'}), 400)
+    if require_template and data['templateId'] not in TEMPLATES:
+        return None, None, (jsonify({'error': f"Unknown template: {data['templateId']}"}), 400)
+    source, error_response = read_resume_source(detach)
+    return data, source, error_response
+
+def resolve_resume_data(user_id, data, source):
+    """Canonical resume data for a generate-pdf form, shared by concurrent identical requests."""
+    cache_key = compute_cache_key(user_id, source.digest, data['jobDescription'], data.get('aiSuggestions', ''))
+    log.debug(f"🧮 cache_key (first12): {cache_key[:12]} for user {user_id}")
+    # A double-click or client retry with the same cache_key waits for the first request instead of re-running the LLM steps.
+    resume_data = resume_generation_flight.do(cache_key, get_or_generate_resume_data, user_id, cache_key, source.load_text, data['jobDescription'], data['aiSuggestions'])
+    # Ensure models are loaded before any downstream scoring (belt-and-suspenders)
+    ensure_models_ready()
+    return resume_data
+
+def generate_resume_pdf(user_id, data, source, wait_for_slot=False):
+    """The whole generate-pdf pipeline (resume data + render) outside of a request; returns PDF bytes."""
+    resume_data = resolve_resume_data(user_id, data, source)
+    return render_resume_pdf(TEMPLATES[data['templateId']], resume_data, wait_for_slot=wait_for_slot, owner=user_id)
+
+def generate_resume_pdf_job(user_id, data, source):
+    """Background-job variant: waits for a render slot instead of failing fast when the queue is full."""
+    return generate_resume_pdf(user_id, data, source, wait_for_slot=True)
+
+def render_all_templates(template_ids, resume_data, owner=None):
+    """({template_id: pdf_bytes}, {template_id: error}) for template_ids; cache misses render in parallel processes."""
+    data_hash = canonical_data_hash(resume_data)
+    pdfs = {}
+    for template_id in template_ids:
+        cached_pdf = rendered_pdf_cache.get(f"{template_id}:{data_hash}")
+        if cached_pdf is not None:
+            pdfs[template_id] = cached_pdf
+    missing = [template_id for template_id in template_ids if template_id not in pdfs]
+    errors = {}
+    if missing:
+        log.info(f"📋 Building PDFs in parallel for: {', '.join(missing)}")
+        rendered, errors = render_service.render_many(missing, resume_data, data_hash=data_hash)
+        for template_id, pdf_bytes in rendered.items():
+            rendered_pdf_cache.set(f"{template_id}:{data_hash}", pdf_bytes, owner=owner)
+        pdfs.update(rendered)
+    return {template_id: pdfs[template_id] for template_id in template_ids if template_id in pdfs}, errors
+
+def render_busy_response(error):
+    response = jsonify({'error': str(error)})
+    response.headers['Retry-After'] = '5'
+    return response, 503
+
 # ✅ THIS ROUTE IS NOW THE MAIN WORKHORSE
 @app.route('/api/generate-pdf', methods=['POST', 'OPTIONS'])
 @login_required
 def generate_pdf_route():
     if request.method == 'OPTIONS': return jsonify(ok=True)
     try:
-        file = request.files.get('resumeFile'); data = request.form.to_dict()
-        if not file or not all(k in data for k in ['jobDescription', 'aiSuggestions', 'templateId']):
-            return jsonify({'error': 'Missing data'}), 400
-        
-        # Create a stable cache key (user + file bytes + jobDescription + aiSuggestions)
-        file.stream.seek(0)
-        file_content = file.stream.read()
-        file.stream.seek(0)  # Reset for extraction
-        cache_hasher = hashlib.sha256()
-        cache_hasher.update(str(current_user.id).encode())
-        cache_hasher.update(file_content)
-        cache_hasher.update(data['jobDescription'].encode())
-        cache_hasher.update(data.get('aiSuggestions', '').encode())
-        cache_key = cache_hasher.hexdigest()
-        print(f"🧮 cache_key (first12): {cache_key[:12]} for user {current_user.id}")
-        
-        # Check if we have cached resume data for this user and file
-        if cache_key in resume_data_cache:
-            print(f"✅ Using CACHED resume data for template: {data['templateId']}")
-            resume_data = resume_data_cache[cache_key]
-        else:
-            # Fallback: reuse last resume for this user if same cache_key matches
-            user_last = last_resume_cache.get(current_user.id)
-            if user_last and user_last.get('cache_key') == cache_key:
-                print(f"♻️ Using LAST resume cache for user {current_user.id}")
-                resume_data = user_last.get('data', {})
-            else:
-                # Generate new resume data only if not cached
-                original_resume_text = extract_text_from_file(file.stream, file.filename)
-                print(f"📄 Generating NEW resume data using canonical schema: template1")
-                resume_data = generate_full_resume_text(original_resume_text, data['jobDescription'], data['aiSuggestions'], 'template1')
-                
-                # Check if resume_data is valid
-                if not resume_data or not isinstance(resume_data, dict):
-                    print(f"❌ ERROR: Invalid resume data generated: {resume_data}")
-                    return jsonify({'error': 'Failed to generate valid resume data'}), 500
-                
-                # Cache the generated data (canonical)
-                resume_data_cache[cache_key] = resume_data
-                last_resume_cache[current_user.id] = {'cache_key': cache_key, 'data': resume_data}
-                print(f"💾 Cached resume data for future use (cache key: {cache_key[:20]}...)")
-
-        # Ensure models are loaded before any downstream scoring (belt-and-suspenders)
-        ensure_models_ready()
-        
-        print(f"📋 Building PDF with template: {data['templateId']}")
+        data, source, error_response = read_generate_pdf_request()
+        if error_response: return error_response
+        pdf_bytes = generate_resume_pdf(current_user.id, data, source)
+        return send_file(BytesIO(pdf_bytes), as_attachment=True, download_name=f"Optimized_Resume_{data['templateId']}.pdf", mimetype='application/pdf')
+    except ResumeDataError as e:
+        return jsonify({'error': str(e)}), 500
+    except TemplateBuildError as e:
+        return jsonify({'error': f'Template error: {str(e)}'}), 500
+    except RenderQueueFullError as e:
+        return render_busy_response(e)
+    except FutureTimeoutError:
+        return jsonify({'error': 'Rendering the PDF timed out'}), 504
+    except Exception as e:
+        log.exception(f"❌ FATAL ERROR in generate_pdf_route: {e}")
+        return jsonify({'error': f'Server error: {str(e)}'}), 500
 
-        # Normalize cached data for the specific template to avoid schema mismatches
-        resume_data_for_template = normalize_resume_for_template(data['templateId'], resume_data)
+@app.route('/api/generate-pdf/all', methods=['POST', 'OPTIONS'])
+@login_required
+def generate_all_pdfs_route():
+    """One ZIP with the resume rendered in every template (or only the comma-separated 'templateIds').
 
-        buffer = BytesIO()
-        try:
-            template_module = importlib.import_module(f"templates.{data['templateId']}")
-            print(f"✅ Template module loaded: {data['templateId']}")
-            build_result = template_module.build(resume_data_for_template)
-            print(f"✅ Story generated successfully for {data['templateId']}")
-        except Exception as template_error:
-            print(f"❌ ERROR building template {data['templateId']}: {template_error}")
-            traceback.print_exc()
-            return jsonify({'error': f'Template error: {str(template_error)}'}), 500
-
-        if data['templateId'] == 'template2' and callable(build_result):
-            # For template2, build_result is a function: call it with buffer
-            build_result(buffer)
-        else:
-            # For other templates, build_result is the story list
-            from reportlab.platypus import SimpleDocTemplate
-            from reportlab.lib.pagesizes import letter
-            # Reduce top and bottom margins for template3 to avoid blank first page
-            if data['templateId'] == 'template3':
-                doc = SimpleDocTemplate(buffer, pagesize=letter, topMargin=24, bottomMargin=24)
-            else:
-                doc = SimpleDocTemplate(buffer, pagesize=letter)
-            doc.build(build_result)
-        buffer.seek(0)
-        print(f"✅ PDF generated successfully for {data['templateId']}")
-        return send_file(buffer, as_attachment=True, download_name=f"Optimized_Resume_{data['templateId']}.pdf", mimetype='application/pdf')
+    Same form as /api/generate-pdf without templateId. Templates that fail to build are
+    left out and listed in the X-Failed-Templates header; if every template fails it is a 500.
+    """
+    if request.method == 'OPTIONS': return jsonify(ok=True)
+    try:
+        data, source, error_response = read_generate_pdf_request(require_template=False)
+        if error_response: return error_response
+        template_ids = [t.strip() for t in data.get('templateIds', '').split(',') if t.strip()] or list(TEMPLATES)
+        unknown = [t for t in template_ids if t not in TEMPLATES]
+        if unknown: return jsonify({'error': f"Unknown template: {', '.join(unknown)}"}), 400
+
+        resume_data = resolve_resume_data(current_user.id, data, source)
+        with metrics.span('render_all'):
+            pdfs, errors = render_all_templates(template_ids, resume_data, owner=current_user.id)
+        if not pdfs:
+            return jsonify({'error': 'Template error: no template could be rendered', 'templates': errors}), 500
+
+        archive = BytesIO()
+        with zipfile.ZipFile(archive, 'w', zipfile.ZIP_DEFLATED) as zf:
+            for template_id, pdf_bytes in pdfs.items():
+                zf.writestr(f"Optimized_Resume_{template_id}.pdf", pdf_bytes)
+        archive.seek(0)
+        log.info(f"🗜️ Exported {len(pdfs)} templates as ZIP for user {current_user.id}" + (f"; failed: {', '.join(errors)}" if errors else ''))
+        response = send_file(archive, as_attachment=True, download_name="Optimized_Resumes.zip", mimetype='application/zip')
+        if errors:
+            response.headers['X-Failed-Templates'] = ','.join(errors)
+        return response
+    except ResumeDataError as e:
+        return jsonify({'error': str(e)}), 500
+    except RenderQueueFullError as e:
+        return render_busy_response(e)
+    except FutureTimeoutError:
+        return jsonify({'error': 'Rendering the PDFs timed out'}), 504
     except Exception as e:
-        print(f"❌ FATAL ERROR in generate_pdf_route: {e}")
-        traceback.print_exc()
+        log.exception(f"❌ FATAL ERROR in generate_all_pdfs_route: {e}")
         return jsonify({'error': f'Server error: {str(e)}'}), 500
 
+@app.route('/api/generate-pdf/jobs', methods=['POST', 'OPTIONS'])
+@login_required
+def submit_pdf_job():
+    """Queue a generate-pdf job (same form fields as /api/generate-pdf) and return its id immediately."""
+    if request.method == 'OPTIONS': return jsonify(ok=True)
+    data, source, error_response = read_generate_pdf_request(detach=True)
+    if error_response: return error_response
+    try:
+        job_id = pdf_jobs.submit(current_user.id, generate_resume_pdf_job, current_user.id, data, source, meta={'template_id': data['templateId']})
+    except JobQueueFullError as e:
+        return jsonify({'error': str(e)}), 503
+    log.info(f"🗂️ Queued PDF job {job_id[:8]} ({data['templateId']}) for user {current_user.id}")
+    return jsonify({
+        'job_id': job_id,
+        'status': 'queued',
+        'status_url': f"/api/generate-pdf/jobs/{job_id}",
+        'result_url': f"/api/generate-pdf/jobs/{job_id}/result",
+    }), 202
+
+@app.route('/api/generate-pdf/jobs/<job_id>', methods=['GET'])
+@login_required
+def pdf_job_status(job_id):
+    job = pdf_jobs.get(job_id, current_user.id)
+    if job is None: return jsonify({'error': 'Job not found'}), 404
+    return jsonify({k: job[k] for k in ('job_id', 'status', 'template_id', 'error') if k in job}), 200
+
+@app.route('/api/generate-pdf/jobs/<job_id>/result', methods=['GET'])
+@login_required
+def pdf_job_result(job_id):
+    job = pdf_jobs.get(job_id, current_user.id)
+    if job is None: return jsonify({'error': 'Job not found'}), 404
+    if job['status'] == 'failed': return jsonify({'error': job.get('error', 'Job failed'), 'status': 'failed'}), 500
+    if job['status'] != 'done': return jsonify({'status': job['status']}), 202
+    pdf_bytes = pdf_jobs.result(job_id)
+    if pdf_bytes is None: return jsonify({'error': 'Job result expired'}), 410
+    return send_file(BytesIO(pdf_bytes), as_attachment=True, download_name=f"Optimized_Resume_{job.get('template_id', 'resume')}.pdf", mimetype='application/pdf')
+
 @app.route('/api/clear-cache', methods=['POST'])
 @login_required
 def clear_cache():
-    """Clear cached resume data for the current user"""
-    global resume_data_cache
-    user_keys = [k for k in resume_data_cache.keys() if k.startswith(f"{current_user.id}_")]
-    for key in user_keys:
-        del resume_data_cache[key]
-    print(f"🧹 Cleared {len(user_keys)} cached items for user {current_user.id}")
+    """Clear everything cached for the current user (via each cache's per-user index), so the next request regenerates"""
+    user_caches = (resume_data_cache, last_resume_cache, rendered_pdf_cache, extracted_text_cache, extraction_cache, rewrite_cache, openai_response_cache)
+    cleared = sum(cache.invalidate_owner(current_user.id) for cache in user_caches)
+    if RESUME_RECORDS:
+        cleared += ResumeRecord.query.filter_by(user_id=current_user.id).delete(synchronize_session=False)
+        db.session.commit()
+    log.info(f"🧹 Cleared {cleared} cached items for user {current_user.id}")
     return jsonify({'message': 'Cache cleared successfully'}), 200
 
+@app.route('/api/cache/stats', methods=['GET'])
+@login_required
+def cache_stats():
+    """Hit/miss/eviction counters for the in-process caches (used to size the limits)."""
+    stats = {cache.name: cache.stats() for cache in (resume_data_cache, last_resume_cache, extracted_text_cache, extraction_cache, rewrite_cache, rendered_pdf_cache, openai_response_cache)}
+    with extraction_stats_lock:
+        stats['extraction'] = {**extraction_stats, 'cpu_seconds_saved': round(extraction_stats['cpu_seconds_saved'], 4)}
+    stats['single_flight'] = {flight.name: flight.stats() for flight in (resume_generation_flight, llm_flight)}
+    stats['render'] = render_service.stats()
+    with resume_record_stats_lock:
+        stats['resume_records'] = dict(resume_record_stats)
+    return jsonify(stats), 200
+
+# Optional bearer token for /api/metrics; without it the endpoint is open (for an internal scraper).
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+
+@app.route('/api/metrics', methods=['GET'])
+def prometheus_metrics():
+    """Stage timings, LLM call/token counters and cache stats of this worker in the Prometheus text format."""
+    if METRICS_TOKEN and request.headers.get('Authorization') != f"Bearer {METRICS_TOKEN}":
+        return jsonify({'error': 'Unauthorized'}), 401
+    caches = (resume_data_cache, last_resume_cache, extracted_text_cache, extraction_cache, rewrite_cache, rendered_pdf_cache, openai_response_cache)
+    cache_stats = [(cache.name, cache.stats()) for cache in caches]
+    extra = []
+    for field in ('entries', 'bytes', 'hits', 'misses', 'evictions', 'owner_evictions', 'expirations', 'rejected', 'errors'):
+        extra += metrics.gauge_lines(f"resume_cache_{field}", f"Cache {field} (hit/miss/eviction counts are per process).",
+                                     [({'cache': name}, stats.get(field)) for name, stats in cache_stats])
+    with extraction_stats_lock:
+        extra += metrics.gauge_lines('resume_extraction_cpu_seconds_saved', 'Parse CPU time avoided by the extracted-text cache.',
+                                     [({}, round(extraction_stats['cpu_seconds_saved'], 4))])
+    extra += metrics.gauge_lines('resume_single_flight_coalesced', 'Calls that waited on an identical in-flight call.',
+                                 [({'flight': flight.name}, flight.stats()['coalesced']) for flight in (resume_generation_flight, llm_flight)])
+    render_stats = render_service.stats()
+    for field in ('in_flight', 'rendered', 'failed', 'rejected', 'pool_restarts'):
+        extra += metrics.gauge_lines(f"resume_render_{field}", f"Render service {field.replace('_', ' ')} ({render_stats['mode']} mode).", [({}, render_stats[field])])
+    return Response(metrics.render(extra), mimetype='text/plain; version=0.0.4')
+
 # --- All other routes are unchanged ---
 @app.route('/api/register', methods=['POST', 'OPTIONS'])
 def register():
@@ -524,7 +1388,8 @@ def register():
         if User.query.filter_by(username=data.get('username')).first(): return jsonify({'error': 'Username already exists'}), 409
         user = User(username=data.get('username'), password_hash=bcrypt.generate_password_hash(data.get('password')).decode('utf-8'))
         db.session.add(user); db.session.commit(); return jsonify({'message': 'User registered successfully'}), 201
-    except: traceback.print_exc(); return jsonify({'error': 'Server error'}), 500
+    except HTTPException: raise
+    except: log.exception("❌ Registration failed"); return jsonify({'error': 'Server error'}), 500
 @app.route('/api/login', methods=['POST', 'OPTIONS'])
 def login():
     # ... code is unchanged ...
@@ -534,7 +1399,8 @@ def login():
         user = User.query.filter_by(username=data.get('username')).first()
         if user and bcrypt.check_password_hash(user.password_hash, data.get('password')): login_user(user); return jsonify({'message': 'Login successful', 'username': user.username}), 200
         return jsonify({'error': 'Invalid credentials'}), 401
-    except: traceback.print_exc(); return jsonify({'error': 'Server error'}), 500
+    except HTTPException: raise
+    except: log.exception("❌ Login failed"); return jsonify({'error': 'Server error'}), 500
 @app.route('/api/logout', methods=['POST'])
 @login_required
 def logout(): logout_user(); return jsonify({'message': 'Logout successful'}), 200
@@ -557,13 +1423,17 @@ def handle_contact_form():
         with smtplib.SMTP('smtp.gmail.com', 587) as server:
             server.starttls(); server.login(sender_email, sender_password); server.sendmail(sender_email, sender_email, email_text.encode('utf-8'))
         return jsonify({'message': 'Feedback sent!'}), 200
+    except HTTPException: raise
     except Exception as e:
-        traceback.print_exc(); return jsonify({'error': 'Could not send email.'}), 500
-with app.app_context():
-    db.create_all()
+        log.exception(f"❌ Could not send feedback email: {e}"); return jsonify({'error': 'Could not send email.'}), 500
+@app.cli.command('prune-resumes')
+def prune_resumes_command():
+    """Delete stored resume data not used for RESUME_RECORD_MAX_AGE_DAYS (e.g. from a daily cron)."""
+    if not prune_resume_records():
+        log.info("🧹 No stored resumes to prune.")
 
 if __name__ == '__main__':
     with app.app_context(): db.create_all()
     configure_ai_and_models()
-    print("🚀 Starting Flask server on http://127.0.0.1:5001")
+    log.info("🚀 Starting Flask server on http://127.0.0.1:5001")
     app.run(debug=False, host='127.0.0.1', port=5001)
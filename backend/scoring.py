@@ -0,0 +1,114 @@
+# ==============================================================================
+# Local ATS match scoring (no LLM call).
+#
+# Tokenizes the resume and job description(s), weights JD keywords with a
+# BM25-style IDF (skill terms boosted), then combines
+#   - weighted keyword coverage: how much of the JD's weighted vocabulary the
+#     resume mentions, with term-frequency saturation, and
+#   - TF-IDF cosine similarity between the two texts
+# into a 0-100 score. Vocabulary and IDF are fit per (resume, JD) pair, so a
+# pair scores the same alone or in any batch; a batch analyzes the resume once.
+# Results are deterministic.
+# ==============================================================================
+
+import re
+
+import numpy as np
+
+TOKEN_RE = re.compile(r"[a-z0-9][a-z0-9+#.]*")
+SENTENCE_RE = re.compile(r"[\n.;•]+")
+
+STOPWORDS = frozenset("""
+a about above after again against all also am an and any are as at be because been before being below between both
+but by can could did do does doing down during each etc few for from further had has have having he her here hers
+him his how i if in into is it its itself just me more most my no nor not now of off on once only or other our ours
+out over own same she should so some such than that the their theirs them then there these they this those through
+to too under until up very was we were what when where which while who whom why will with would you your yours
+able ability across along among based candidate candidates company etc experience including job looking must new
+plus preferred required requirements responsibilities role strong team teams us using work working years year
+""".split())
+
+# Terms that carry extra weight when they appear in a job description.
+SKILL_TERMS = frozenset("""
+python java javascript typescript c++ c# go golang rust ruby php kotlin swift scala r sql nosql html css react angular
+vue node.js node django flask fastapi spring rails express graphql rest api apis microservices docker kubernetes
+terraform ansible aws azure gcp cloud linux git ci cd devops jenkins postgresql postgres mysql mongodb redis kafka
+spark hadoop airflow etl pandas numpy tensorflow pytorch keras scikit-learn sklearn nlp llm llms ml ai
+machine learning deep vision analytics tableau excel powerbi statistics agile scrum jira figma testing pytest selenium
+security networking leadership communication mentoring stakeholder management marketing sales seo finance accounting
+""".split())
+
+SKILL_BOOST = 1.5
+SATURATION_K = 0.25      # resume TF saturation: 1 mention -> 0.8, 2 -> 0.89, 3 -> 0.92
+COVERAGE_WEIGHT = 0.8    # rest of the score is TF-IDF cosine similarity
+
+
+def tokenize(text):
+    tokens = (t.rstrip('.') for t in TOKEN_RE.findall((text or '').lower()))
+    return [t for t in tokens if len(t) > 1 and t not in STOPWORDS and not t.isdigit()]
+
+
+def _term_counts(tokens, vocab):
+    counts = np.zeros(len(vocab))
+    if tokens:
+        np.add.at(counts, [vocab[t] for t in tokens], 1.0)
+    return counts
+
+
+def _analyze(text):
+    """(tokens, per-sentence term sets, sentence count) of one text."""
+    sentences = SENTENCE_RE.split(text or '')
+    return tokenize(text), [set(tokenize(sentence)) for sentence in sentences], len(sentences)
+
+
+def _score_pair(resume, job):
+    resume_tokens, resume_sentences, resume_sentence_count = resume
+    jd_tokens, jd_sentences, jd_sentence_count = job
+    vocab = {}
+    for tokens in (resume_tokens, jd_tokens):
+        for t in tokens:
+            vocab.setdefault(t, len(vocab))
+    if not vocab or not resume_tokens:
+        return 0.0
+
+    resume_tf = _term_counts(resume_tokens, vocab)
+    jd_tf = _term_counts(jd_tokens, vocab)
+
+    # Document frequency over the sentences of both texts, so words that show up
+    # everywhere ("develop", "systems") weigh less than distinctive keywords.
+    df = np.zeros(len(vocab))
+    for sentence in (*resume_sentences, *jd_sentences):
+        terms = [vocab[t] for t in sentence if t in vocab]
+        if terms:
+            df[terms] += 1
+    n_docs = max(resume_sentence_count + jd_sentence_count, 1)
+    idf = np.log1p((n_docs - df + 0.5) / (df + 0.5))
+    boost = np.array([SKILL_BOOST if term in SKILL_TERMS else 1.0 for term in vocab])
+    idf = idf * boost
+
+    jd_weights = np.where(jd_tf > 0, 1.0 + np.log(np.maximum(jd_tf, 1.0)), 0.0) * idf
+    resume_weights = np.where(resume_tf > 0, 1.0 + np.log(np.maximum(resume_tf, 1.0)), 0.0) * idf
+
+    saturation = resume_tf / (resume_tf + SATURATION_K)
+    jd_total = jd_weights.sum()
+    coverage = jd_weights @ saturation / jd_total if jd_total > 0 else 0.0
+
+    norm = np.linalg.norm(jd_weights) * np.linalg.norm(resume_weights)
+    cosine = jd_weights @ resume_weights / norm if norm > 0 else 0.0
+
+    value = 100.0 * (COVERAGE_WEIGHT * coverage + (1.0 - COVERAGE_WEIGHT) * cosine)
+    return round(float(min(max(value, 0.0), 100.0)), 1)
+
+
+def score_many(resume_text, job_descriptions):
+    """Match scores (0-100, one decimal) of one resume against each job description, as a NumPy array.
+
+    score_many(resume, jds)[i] == score(resume, jds[i]): the other JDs in the batch never
+    change a pair's score. The resume is only analyzed once per batch.
+    """
+    resume = _analyze(resume_text)
+    return np.array([_score_pair(resume, _analyze(jd)) for jd in job_descriptions], dtype=float)
+
+
+def score(resume_text, job_description):
+    return float(score_many(resume_text, [job_description])[0])
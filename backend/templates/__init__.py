@@ -0,0 +1,59 @@
+# ==============================================================================
+# Template registry.
+#
+# Every module in this package named templateN.py is imported once at startup
+# and validated. A template module must define:
+#   get_json_prompt()   -> str, the JSON shape the AI should fill in
+#   build(resume_data)  -> flowables (BUILD_MODE 'story') or a callable that
+#                          draws into a buffer (BUILD_MODE 'canvas')
+# and may define:
+#   BUILD_MODE          'story' (default) or 'canvas'
+#   PAGE_SETTINGS       SimpleDocTemplate kwargs, merged over DEFAULT_PAGE_SETTINGS
+# ==============================================================================
+
+import importlib
+import pkgutil
+import re
+from collections import namedtuple
+
+from reportlab.lib.pagesizes import letter
+
+BUILD_MODES = ('story', 'canvas')
+DEFAULT_PAGE_SETTINGS = {'pagesize': letter}
+
+TemplateSpec = namedtuple('TemplateSpec', ['template_id', 'module', 'build', 'get_json_prompt', 'build_mode', 'page_settings'])
+
+
+class UnknownTemplateError(KeyError):
+    """Raised for a template id that is not in the registry."""
+
+
+def load_template(template_id):
+    """Import and validate one template module, returning its TemplateSpec."""
+    module = importlib.import_module(f"{__name__}.{template_id}")
+    for attr in ('build', 'get_json_prompt'):
+        if not callable(getattr(module, attr, None)):
+            raise TypeError(f"Template '{template_id}' is missing a callable {attr}()")
+    build_mode = getattr(module, 'BUILD_MODE', 'story')
+    if build_mode not in BUILD_MODES:
+        raise ValueError(f"Template '{template_id}' has unknown BUILD_MODE {build_mode!r}; expected one of {BUILD_MODES}")
+    page_settings = {**DEFAULT_PAGE_SETTINGS, **getattr(module, 'PAGE_SETTINGS', {})}
+    return TemplateSpec(template_id, module, module.build, module.get_json_prompt, build_mode, page_settings)
+
+
+def discover_templates():
+    """Load every templateN module in this package, ordered by N."""
+    names = [info.name for info in pkgutil.iter_modules(__path__) if re.fullmatch(r'template\d+', info.name)]
+    names.sort(key=lambda name: int(name[len('template'):]))
+    return {name: load_template(name) for name in names}
+
+
+def get_template(template_id):
+    try:
+        return TEMPLATES[template_id]
+    except KeyError:
+        raise UnknownTemplateError(template_id) from None
+
+
+# Loaded eagerly so a broken template fails at startup, not on a user's request.
+TEMPLATES = discover_templates()
@@ -6,6 +6,9 @@ from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.colors import black
 from reportlab.lib.units import inch
 
+BUILD_MODE = 'story'
+PAGE_SETTINGS = {}
+
 def get_json_prompt():
     # ✅ UPGRADED: Now uses a dictionary for 'contact' and 'skills'
     return """
@@ -20,9 +23,16 @@ def get_json_prompt():
     }}
     """
 
+def build_styles():
+    styles = getSampleStyleSheet(); styles.add(ParagraphStyle(name='HeaderName', fontSize=28, leading=34, alignment=1, spaceBottom=6, fontName='Helvetica')); styles.add(ParagraphStyle(name='HeaderContact', fontSize=10, leading=12, alignment=1, spaceBottom=20)); styles.add(ParagraphStyle(name='SectionHeader', fontSize=10, fontName='Helvetica-Bold', leading=14, spaceBottom=8, spaceBefore=6)); styles.add(ParagraphStyle(name='EntryHeader', fontSize=12, fontName='Helvetica-Bold', leading=14)); styles.add(ParagraphStyle(name='EntrySubHeader', fontSize=11, fontName='Helvetica-Oblique', spaceBottom=6)); styles.add(ParagraphStyle(name='BulletPoint', leftIndent=20, firstLineIndent=-10, spaceBottom=2, leading=14)); styles.add(ParagraphStyle(name='RightAlign', alignment=2)); styles.add(ParagraphStyle(name='SkillCategory', fontName='Helvetica-Bold', fontSize=9.5, spaceBefore=4))
+    return styles
+
+# Built once per process and shared by every build(); treat as read-only.
+STYLES = build_styles()
+
 def build(resume_data):
     # This build function is now robust and handles the new structure.
-    styles = getSampleStyleSheet(); styles.add(ParagraphStyle(name='HeaderName', fontSize=28, leading=34, alignment=1, spaceBottom=6, fontName='Helvetica')); styles.add(ParagraphStyle(name='HeaderContact', fontSize=10, leading=12, alignment=1, spaceBottom=20)); styles.add(ParagraphStyle(name='SectionHeader', fontSize=10, fontName='Helvetica-Bold', leading=14, spaceBottom=8, spaceBefore=6)); styles.add(ParagraphStyle(name='EntryHeader', fontSize=12, fontName='Helvetica-Bold', leading=14)); styles.add(ParagraphStyle(name='EntrySubHeader', fontSize=11, fontName='Helvetica-Oblique', spaceBottom=6)); styles.add(ParagraphStyle(name='BulletPoint', leftIndent=20, firstLineIndent=-10, spaceBottom=2, leading=14)); styles.add(ParagraphStyle(name='RightAlign', alignment=2)); styles.add(ParagraphStyle(name='SkillCategory', fontName='Helvetica-Bold', fontSize=9.5, spaceBefore=4))
+    styles = STYLES
     story = []
     story.append(Paragraph(resume_data.get("name", "Full Name"), styles['HeaderName']))
     # ✅ FIX: Handle the new 'contact' dictionary
@@ -4,12 +4,18 @@
 # ==============================================================================
 
 import os
+from io import BytesIO
 from reportlab.platypus import Paragraph, Spacer, Table, TableStyle, Image
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.colors import HexColor, white, black
 from reportlab.lib.units import inch
+from reportlab.lib.utils import ImageReader
 from reportlab.platypus.flowables import KeepInFrame
 
+BUILD_MODE = 'story'
+# Reduced top and bottom margins to avoid a blank first page.
+PAGE_SETTINGS = {'topMargin': 24, 'bottomMargin': 24}
+
 def get_json_prompt():
     # ✅ UPGRADED to the universal structure
     return """
@@ -25,9 +31,7 @@ def get_json_prompt():
     }}
     """
 
-def build(resume_data):
-    """Builds the 'Kai Carter' modern, graphic-heavy resume."""
-    story = []
+def build_styles():
     styles = getSampleStyleSheet()
     
     # --- Define Styles ---
@@ -43,6 +47,31 @@ def build(resume_data):
     styles.add(ParagraphStyle(name='T3_BodyDates', fontName='Helvetica', fontSize=9, textColor=HexColor("#555555"), spaceAfter=4))
     styles.add(ParagraphStyle(name='T3_BodyText', fontName='Helvetica', fontSize=9.5, leading=12))
     styles.add(ParagraphStyle(name='T3_BodyListItem', fontName='Helvetica', fontSize=9.5, leading=14))
+    return styles
+
+def load_graphic():
+    """Reads and checks the header graphic once; returns its PNG bytes, or None if it is missing."""
+    try:
+        backend_root_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+        image_path = os.path.join(backend_root_dir, 'assets', 'template3_graphic.png')
+        if not os.path.exists(image_path):
+            raise FileNotFoundError(f"Image not found at expected path: {image_path}")
+        with open(image_path, 'rb') as f:
+            data = f.read()
+        ImageReader(BytesIO(data)).getSize()  # fail here, not on the first render, if the PNG is unreadable
+        return data
+    except Exception as e:
+        print(f"FATAL ERROR: Could not load template3_graphic.png. Error: {e}")
+        return None
+
+# Built once per process and shared by every build(); treat as read-only.
+STYLES = build_styles()
+GRAPHIC_PNG = load_graphic()
+
+def build(resume_data):
+    """Builds the 'Kai Carter' modern, graphic-heavy resume."""
+    story = []
+    styles = STYLES
 
     # All the rendering logic below is correct and does not need to be changed.
     header_left_content = [
@@ -61,16 +90,11 @@ def build(resume_data):
         header_left_content.append(contact_table)
     
     header_right_content = []
-    try:
-        backend_root_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
-        image_path = os.path.join(backend_root_dir, 'assets', 'template3_graphic.png')
-        if not os.path.exists(image_path):
-            raise FileNotFoundError(f"Image not found at expected path: {image_path}")
-        img = Image(image_path, width=2.5*inch, height=1.5*inch)
+    if GRAPHIC_PNG is not None:
+        img = Image(BytesIO(GRAPHIC_PNG), width=2.5*inch, height=1.5*inch)  # no disk read per render
         img.hAlign = 'RIGHT'
         header_right_content.append(img)
-    except Exception as e:
-        print(f"FATAL ERROR: Could not load template3_graphic.png. Error: {e}")
+    else:
         error_message = Paragraph("!! GRAPHIC MISSING !!", styles['Normal'])
         header_right_content.append(error_message)
 
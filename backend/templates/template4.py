@@ -4,10 +4,15 @@
 # ==============================================================================
 
 import os
+from io import BytesIO
 from reportlab.platypus import Paragraph, Spacer, Table, TableStyle, Image, HRFlowable
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.colors import HexColor, white, black
 from reportlab.lib.units import inch
+from reportlab.lib.utils import ImageReader
+
+BUILD_MODE = 'story'
+PAGE_SETTINGS = {}
 
 def get_json_prompt():
     """Defines the JSON structure the AI must generate for this template."""
@@ -58,9 +63,7 @@ def get_json_prompt():
     }}
     """
 
-def build(resume_data):
-    """Builds the 'Olivia Wilson' clean, modern resume."""
-    story = []
+def build_styles():
     styles = getSampleStyleSheet()
     grey = HexColor("#4D4D4D")
 
@@ -75,6 +78,32 @@ def build(resume_data):
     styles.add(ParagraphStyle(name='RightRole', fontName='Helvetica', fontSize=9, textColor=grey, spaceAfter=4))
     styles.add(ParagraphStyle(name='RightDates', fontName='Helvetica', fontSize=9, textColor=grey, alignment=2))
     styles.add(ParagraphStyle(name='RightBullet', leftIndent=12, firstLineIndent=-12, spaceAfter=4, textColor=grey, leading=14))
+    return styles
+
+def load_watermark():
+    """Reads and checks the watermark once; returns its PNG bytes, or None if it is missing."""
+    try:
+        backend_root_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+        image_path = os.path.join(backend_root_dir, 'assets', 'template4_watermark.png')
+        if not os.path.exists(image_path):
+            raise FileNotFoundError("Watermark image not found.")
+        with open(image_path, 'rb') as f:
+            data = f.read()
+        ImageReader(BytesIO(data)).getSize()  # fail here, not on the first render, if the PNG is unreadable
+        return data
+    except Exception as e:
+        print(f"WARNING: Could not load watermark for template 4. Error: {e}")
+        return None
+
+# Built once per process and shared by every build(); treat as read-only.
+STYLES = build_styles()
+WATERMARK_PNG = load_watermark()
+
+def build(resume_data):
+    """Builds the 'Olivia Wilson' clean, modern resume."""
+    story = []
+    styles = STYLES
+    grey = HexColor("#4D4D4D")
 
     # ==================================================
     #                BUILD HEADER
@@ -83,14 +112,9 @@ def build(resume_data):
         Paragraph(resume_data.get('name', '').upper(), styles['MainName']),
         Paragraph(resume_data.get('title', '').upper(), styles['MainTitle']),
     ]
-    try:
-        backend_root_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
-        image_path = os.path.join(backend_root_dir, 'assets', 'template4_watermark.png')
-        if not os.path.exists(image_path):
-            raise FileNotFoundError("Watermark image not found.")
-        
+    if WATERMARK_PNG is not None:
         # Create a table to layer the text over the image
-        watermark_img = Image(image_path, width=2.5*inch, height=1.2*inch)
+        watermark_img = Image(BytesIO(WATERMARK_PNG), width=2.5*inch, height=1.2*inch)  # no disk read per render
         header_table = Table(
             [[[watermark_img], header_content]], 
             colWidths='100%',
@@ -100,8 +124,7 @@ def build(resume_data):
             ]
         )
         story.append(header_table)
-    except Exception as e:
-        print(f"WARNING: Could not load watermark for template 4. Error: {e}")
+    else:
         story.extend(header_content) # Add text without watermark as a fallback
 
     story.append(Spacer(1, 0.2*inch))
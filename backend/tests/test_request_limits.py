@@ -0,0 +1,42 @@
+import io
+import json
+import os
+import tempfile
+
+import pytest
+
+_workdir = tempfile.mkdtemp(prefix='resume_builder_test_')
+os.environ.setdefault('OPENAI_API_KEY', 'sk-test')
+os.environ.setdefault('DATABASE_URL', 'sqlite:///' + os.path.join(_workdir, 'site.db'))
+os.environ.setdefault('SHARED_CACHE_PATH', os.path.join(_workdir, 'cache.db'))
+
+import run  # noqa: E402
+
+
+@pytest.fixture
+def client():
+    return run.app.test_client()
+
+
+def oversized_credentials():
+    return json.dumps({'username': 'x' * run.app.config['MAX_CONTENT_LENGTH'], 'password': 'secret'}).encode()
+
+
+@pytest.mark.parametrize('path', ['/api/register', '/api/login'])
+def test_oversized_json_body_is_413(client, path):
+    response = client.post(path, data=oversized_credentials(), content_type='application/json')
+    assert response.status_code == 413
+    assert 'limit' in response.get_json()['error']
+
+
+@pytest.mark.parametrize('path', ['/api/register', '/api/login'])
+def test_oversized_chunked_json_body_is_413(client, path):
+    # No Content-Length, so the cap only trips while the view reads the body.
+    response = client.post(path, input_stream=io.BytesIO(oversized_credentials()), content_type='application/json',
+                           environ_overrides={'wsgi.input_terminated': True})
+    assert response.status_code == 413
+
+
+def test_malformed_json_is_400_not_500(client):
+    response = client.post('/api/login', data=b'{not json', content_type='application/json')
+    assert response.status_code == 400
@@ -0,0 +1,29 @@
+import scoring
+
+RESUME = """Jane Doe. Python and Flask engineer; built REST APIs on AWS with Docker.
+Led a team of 4 moving services to Kubernetes. SQL, pandas, node.js, React."""
+
+JOBS = [
+    "Senior Python developer. Flask, AWS and Docker experience required.",
+    "Java Spring engineer; Kubernetes and microservices.",
+    "Data analyst: SQL, pandas, Tableau. Strong communication.",
+    "[Remote] Frontend engineer - React, node.js, TypeScript.",
+    "",
+]
+
+
+def test_batch_scores_match_single_scores():
+    singles = [scoring.score(RESUME, jd) for jd in JOBS]
+    assert list(scoring.score_many(RESUME, JOBS)) == singles
+    # neither the other JDs in a batch nor duplicates change a pair's score
+    assert list(scoring.score_many(RESUME, JOBS[::-1])) == singles[::-1]
+    assert list(scoring.score_many(RESUME, [JOBS[0]] * 3 + JOBS[1:2])) == [singles[0]] * 3 + singles[1:2]
+
+
+def test_scores_are_bounded_and_rank_the_closer_job_higher():
+    scores = scoring.score_many(RESUME, JOBS)
+    assert all(0.0 <= value <= 100.0 for value in scores)
+    assert scores[0] > scores[1]
+    assert scoring.score("", JOBS[0]) == 0.0
+    assert scoring.score(RESUME, "") == 0.0
+    assert len(scoring.score_many(RESUME, [])) == 0
@@ -0,0 +1,61 @@
+# ==============================================================================
+# Streaming multipart uploads for run.py.
+#
+# StreamingUploadRequest writes every uploaded file part into a HashingSpool as
+# the body arrives: a SpooledTemporaryFile (memory up to UPLOAD_SPOOL_BYTES, then
+# a temp file on disk) that updates a SHA-256 with each chunk it is given. The
+# handler gets the digest without reading the file again, and parsers read the
+# same spool. The total body size is capped by MAX_CONTENT_LENGTH (run.py).
+# ==============================================================================
+
+import hashlib
+import os
+from tempfile import SpooledTemporaryFile
+
+from flask import Request
+
+# Uploads bigger than this are spooled to a temp file instead of held in memory.
+UPLOAD_SPOOL_BYTES = int(os.environ.get('UPLOAD_SPOOL_BYTES', str(512 * 1024)))
+CHUNK_SIZE = 64 * 1024
+
+
+class HashingSpool:
+    """Writable, seekable upload buffer that hashes everything written to it."""
+
+    def __init__(self, max_size=UPLOAD_SPOOL_BYTES):
+        self._spool = SpooledTemporaryFile(max_size=max_size, mode='w+b')
+        self.sha256 = hashlib.sha256()
+        self.size = 0
+
+    def write(self, data):
+        self.sha256.update(data)
+        self.size += len(data)
+        return self._spool.write(data)
+
+    def __iter__(self):
+        return iter(self._spool)
+
+    def __getattr__(self, name):
+        # read, seek, tell, close, ... go straight to the spool
+        return getattr(self._spool, name)
+
+
+class StreamingUploadRequest(Request):
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return HashingSpool()
+
+
+def stream_sha256(stream):
+    """Hex SHA-256 of a file-like object, which is left rewound.
+
+    Free for a HashingSpool; anything else is hashed in CHUNK_SIZE reads.
+    """
+    if isinstance(stream, HashingSpool):
+        stream.seek(0)
+        return stream.sha256.hexdigest()
+    stream.seek(0)
+    hasher = hashlib.sha256()
+    for chunk in iter(lambda: stream.read(CHUNK_SIZE), b''):
+        hasher.update(chunk)
+    stream.seek(0)
+    return hasher.hexdigest()
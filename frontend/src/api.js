@@ -33,16 +33,78 @@ export const getStatus = () =>
 // 🤖 RESUME OPTIMIZATION FUNCTIONS
 // ================================
 
+// --- Upload the resume once (FormData with resumeFile); resolves to { resumeId, fileName } ---
+// Every call below accepts resumeId in place of resumeFile, so later requests skip the file upload.
+export const uploadResume = (formData) =>
+    axios.post(`${API_URL}/resumes`, formData);
+
 // --- Both functions accept FormData objects ---
 export const optimizeResume = (formData) => {
     return axios.post(`${API_URL}/optimize`, formData);
 };
 
+// --- Streaming variant of optimizeResume (server-sent events) ---
+// onEvent(eventName, payload) fires for 'raw_score', 'suggestion' ({ delta }),
+// 'optimized_score', 'done' (same payload as optimizeResume) and 'error'.
+export const optimizeResumeStream = async (formData, onEvent) => {
+    const response = await fetch(`${API_URL}/optimize/stream`, {
+        method: 'POST',
+        body: formData,
+        credentials: 'include',
+    });
+    if (!response.ok || !response.body) {
+        throw new Error(`Streaming optimize failed with status ${response.status}`);
+    }
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    for (;;) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+        let boundary;
+        while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+            const rawEvent = buffer.slice(0, boundary);
+            buffer = buffer.slice(boundary + 2);
+            let eventName = 'message';
+            let data = '';
+            rawEvent.split('\n').forEach((line) => {
+                if (line.startsWith('event: ')) eventName = line.slice(7);
+                else if (line.startsWith('data: ')) data += line.slice(6);
+            });
+            onEvent(eventName, data ? JSON.parse(data) : null);
+        }
+    }
+};
+
 export const generatePdf = (formData) => {
     return axios.post(`${API_URL}/generate-pdf`, formData, {
         responseType: 'blob', // Crucial for file downloads
     });
 };
+// --- Every template in one ZIP (same formData as generatePdf, templateId not needed) ---
+// Templates that failed to render are listed in the 'x-failed-templates' response header.
+export const generateAllPdfs = (formData) => {
+    return axios.post(`${API_URL}/generate-pdf/all`, formData, {
+        responseType: 'blob',
+    });
+};
+// --- One resume against many job descriptions (formData: resumeFile + jobDescriptions[]) ---
+export const scoreBatch = (formData) =>
+    axios.post(`${API_URL}/score-batch`, formData);
+
+// --- Async PDF generation: submit, then poll status and fetch the result ---
+export const submitPdfJob = (formData) =>
+    axios.post(`${API_URL}/generate-pdf/jobs`, formData);
+
+export const getPdfJobStatus = (jobId) =>
+    axios.get(`${API_URL}/generate-pdf/jobs/${jobId}`);
+
+export const getPdfJobResult = (jobId) =>
+    axios.get(`${API_URL}/generate-pdf/jobs/${jobId}/result`, {
+        responseType: 'blob',
+    });
+
 // ✅ ADD THIS NEW FUNCTION AT THE BOTTOM OF api.js
 export const sendFeedback = (feedbackData) =>
     axios.post(`${API_URL}/contact`, feedbackData);
@@ -3,7 +3,7 @@ import React, { useState } from "react";
 import { useNavigate } from "react-router-dom"; // Import useNavigate
 import "./Dashboard.css";
 import { FaFileUpload, FaBrain } from "react-icons/fa";
-import { optimizeResume } from "../api";
+import { optimizeResume, uploadResume } from "../api";
 
 // Accept setPdfData as a prop
 const Dashboard = ({ setPdfData }) => {
@@ -30,10 +30,14 @@ const Dashboard = ({ setPdfData }) => {
       return;
     }
     setLoading(true);
-    const formData = new FormData();
-    formData.append("resumeFile", resumeFile);
-    formData.append("jobDescription", jobDescription);
     try {
+      // Upload once; the optimize call and every template download then refer to it by id
+      const uploadData = new FormData();
+      uploadData.append("resumeFile", resumeFile);
+      const { resumeId } = (await uploadResume(uploadData)).data;
+      const formData = new FormData();
+      formData.append("resumeId", resumeId);
+      formData.append("jobDescription", jobDescription);
       const response = await optimizeResume(formData);
       const data = response.data;
       setMatchScore(data.match_score);
@@ -43,6 +47,7 @@ const Dashboard = ({ setPdfData }) => {
       // Save all necessary data for the PDF to the shared state in App.js
       setPdfData({
         resumeFile,
+        resumeId,
         jobDescription,
         suggestions: data.optimized_resume.split("\n").filter((s) => s.trim() !== "")
       });
@@ -26,7 +26,11 @@ const TemplatesPage = ({ pdfData }) => {
     setLoadingTemplate(templateId);
     try {
       const formData = new FormData();
-      formData.append('resumeFile', pdfData.resumeFile);
+      if (pdfData.resumeId) {
+        formData.append('resumeId', pdfData.resumeId);
+      } else {
+        formData.append('resumeFile', pdfData.resumeFile);
+      }
       formData.append('jobDescription', pdfData.jobDescription);
       formData.append('aiSuggestions', pdfData.suggestions.join('\n'));
       formData.append('templateId', templateId); // This will now send 'template1'